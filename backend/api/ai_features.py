@@ -1,22 +1,69 @@
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, Body
+import asyncio
+import json
+import re
+from itertools import islice
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from app.services.ai_features import get_ai_service
-from app.services.openalex import resolve_work, get_referenced_works
+from app.services.cache import TTLCache, content_key
+from app.services.openalex import resolve_works_async, abstract_from_inverted_index
 from typing import Optional
 
 # Elasticsearch client for fetching paper metadata
-from app.services.arxiv_ingest import es, INDEX_NAME
+from app.services.arxiv_ingest import async_es, INDEX_NAME
 
 router = APIRouter()
 ai_service = get_ai_service()
 
+# Full compare-papers responses keyed on the request inputs; they expire so that edits to the
+# papers or their references show up without a restart
+_comparison_cache = TTLCache(maxsize=256, ttl=300)
+
+# Source fields read from ES for input papers and for their references
+_PAPER_FIELDS = ['title', 'abstract', 'summary', 'description', 'references', 'reference_ids']
+_REF_FIELDS = ['title', 'name', 'authors', 'year', 'published']
+
+# Papers summarized per server-sent event batch in streaming mode
+_STREAM_BATCH_SIZE = 8
+
+# Sentence boundaries: line breaks, or whitespace after terminal punctuation
+_SENT_SPLIT_RE = re.compile(r"\n|\r|(?<=[\.\?\!])\s+")
+
+
+def _pairwise_intersections(sets: List[set]):
+    """Return (intersection-size matrix, set sizes) for a list of sets via one matmul."""
+    vocab = {item: col for col, item in enumerate(set().union(*sets))}
+    membership = np.zeros((len(sets), len(vocab)), dtype=np.float32)
+    for row, items in enumerate(sets):
+        membership[row, [vocab[item] for item in items]] = 1.0
+    return membership @ membership.T, membership.sum(axis=1)
+
+
+async def _fetch_sources(ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Fetch `_source` for many ids with a single ES mget; missing ids are omitted.
+
+    `fields` restricts the returned source to those keys to keep payloads small.
+    """
+    ids = list(dict.fromkeys(str(i) for i in ids if i))
+    if not ids:
+        return {}
+    try:
+        resp = await async_es.mget(index=INDEX_NAME, ids=ids, _source_includes=fields)
+    except Exception:
+        return {}
+    return {d['_id']: d.get('_source', {}) for d in resp.get('docs', []) if d.get('found')}
+
+
 class SummarizationRequest(BaseModel):
     """Request model for summarization"""
     text: str
     max_length: int = 150
     min_length: int = 40
+    cache_bypass: bool = False
 
 class QuestionAnswerRequest(BaseModel):
     """Request model for question answering"""
@@ -34,10 +81,11 @@ async def summarize_text(request: SummarizationRequest):
     Generate a concise summary of the provided text
     """
     try:
-        summary = ai_service.generate_summary(
+        summary = await ai_service.generate_summary_async(
             request.text,
             max_length=request.max_length,
-            min_length=request.min_length
+            min_length=request.min_length,
+            use_cache=not request.cache_bypass
         )
         return {"summary": summary}
     except Exception as e:
@@ -84,22 +132,40 @@ class PaperIdsRequest(BaseModel):
     paper_ids: List[str]
     max_length: Optional[int] = 200
     min_length: Optional[int] = 40
+    cache_bypass: bool = False
 
 
 @router.post("/summarize-papers")
-async def summarize_papers(request: PaperIdsRequest):
+async def summarize_papers(
+    request: PaperIdsRequest,
+    stream: bool = Query(False, description="Stream summaries as server-sent events as they complete")
+):
     """Summarize a list of papers by their IDs (uses paper.abstract if available)"""
-    summaries = []
+    sources = await _fetch_sources(request.paper_ids, fields=['abstract', 'summary', 'description', 'title'])
+    texts = []
     for pid in request.paper_ids:
-        try:
-            doc = es.get(index=INDEX_NAME, id=pid)
-            src = doc.get('_source', {})
-        except Exception:
-            src = {}
-
-        text = src.get('abstract') or src.get('summary') or src.get('description') or src.get('title') or ''
-        summary = ai_service.generate_summary(text, max_length=request.max_length, min_length=request.min_length)
-        summaries.append({"paper_id": pid, "summary": summary})
+        src = sources.get(pid, {})
+        texts.append(src.get('abstract') or src.get('summary') or src.get('description') or src.get('title') or '')
+
+    if stream:
+        async def _events():
+            # one `data:` event per paper, emitted as each mini-batch finishes
+            for start in range(0, len(texts), _STREAM_BATCH_SIZE):
+                outputs = await ai_service.generate_summaries_async(
+                    texts[start:start + _STREAM_BATCH_SIZE],
+                    max_length=request.max_length,
+                    min_length=request.min_length,
+                    use_cache=not request.cache_bypass
+                )
+                for pid, s in zip(request.paper_ids[start:start + _STREAM_BATCH_SIZE], outputs):
+                    yield f"data: {json.dumps({'paper_id': pid, 'summary': s})}\n\n"
+
+        return StreamingResponse(_events(), media_type="text/event-stream")
+
+    outputs = await ai_service.generate_summaries_async(texts, max_length=request.max_length,
+                                                        min_length=request.min_length,
+                                                        use_cache=not request.cache_bypass)
+    summaries = [{"paper_id": pid, "summary": s} for pid, s in zip(request.paper_ids, outputs)]
 
     return {"summaries": summaries}
 
@@ -110,37 +176,82 @@ class CompareRequest(BaseModel):
     max_length: Optional[int] = 300
     min_length: Optional[int] = 50
     compare_mode: Optional[str] = "full"  # options: methods, results, datasets, novelty, full
+    cache_bypass: bool = False
 
 
-@router.post("/compare-papers")
+@router.post("/compare-papers", response_class=ORJSONResponse)
 async def compare_papers(request: CompareRequest):
     """Compare two or more papers and produce a concise comparison summary."""
-    papers = []
-    # Gather paper metadata from ES; if missing, try resolving via OpenAlex
-    for pid in request.paper_ids:
+    cache_key = content_key('\x1f'.join(request.paper_ids), request.compare_mode, request.prompt,
+                            request.max_length, request.min_length)
+    if not request.cache_bypass:
+        cached = _comparison_cache.get(cache_key)
+        if cached is not None:
+            return ORJSONResponse(cached)
+
+    if not request.paper_ids:
+        return ORJSONResponse({
+            "papers": [],
+            "comparison": "",
+            "metrics": {"embedding_similarity": [], "citation_overlap": [], "keyword_overlap": []},
+            "evidence_graph": {'nodes': [], 'edges': []},
+            "comparison_points": []
+        })
+
+    # Gather paper metadata from ES in one round-trip; papers missing from ES are
+    # resolved via OpenAlex (arXiv/DOI/OpenAlex id) concurrently
+    # Duplicate ids are loaded, embedded and keyword-extracted once, then fanned out
+    unique_pids = list(dict.fromkeys(request.paper_ids))
+    sources = await _fetch_sources(unique_pids, fields=_PAPER_FIELDS)
+    unresolved = [pid for pid in unique_pids if not sources.get(pid)]
+    oa_works = dict(zip(unresolved, await resolve_works_async(unresolved)))
+
+    def _load_paper(pid: str) -> Dict[str, Any]:
         oa_work = None
-        try:
-            doc = es.get(index=INDEX_NAME, id=pid)
-            src = doc.get('_source', {})
-        except Exception:
-            src = {}
-        # If no ES source found, try OpenAlex resolution (arXiv/DOI/OpenAlex id)
+        src = sources.get(pid, {})
         if not src:
-            oa_work = resolve_work(pid)
+            oa_work = oa_works.get(pid)
             if oa_work:
+                # OpenAlex ships abstracts as an inverted index; rebuild the ordered text once
+                # and keep it on the work object so later lookups reuse it
+                if not oa_work.get('abstract'):
+                    oa_work['abstract'] = abstract_from_inverted_index(oa_work.get('abstract_inverted_index'))
                 # Map OpenAlex fields to our expected source shape
                 src = {
                     'title': oa_work.get('display_name') or oa_work.get('title'),
-                    'abstract': oa_work.get('abstract') or oa_work.get('abstract_inverted_index') and ' '.join(oa_work.get('abstract_inverted_index', {}).keys()) or '',
+                    'abstract': oa_work.get('abstract') or '',
                     'references': oa_work.get('referenced_works') or []
                 }
 
-        papers.append({
+        return {
             "id": pid,
             "title": src.get('title'),
             "abstract": src.get('abstract') or src.get('summary') or src.get('description') or '' ,
             "_oa": oa_work
-        })
+        }
+
+    unique_papers = [_load_paper(pid) for pid in unique_pids]
+    # rows[k] is the index in unique_papers of the k-th requested paper
+    unique_row = {pid: i for i, pid in enumerate(unique_pids)}
+    rows = [unique_row[pid] for pid in request.paper_ids]
+    papers = [unique_papers[row] for row in rows]
+
+    # A single paper has nothing to compare against: skip the pairwise metrics,
+    # evidence graph and comparison generation and return just its summary.
+    if len(papers) == 1:
+        p = papers[0]
+        summary = await ai_service.generate_summary_async(p.get('abstract',''), max_length=150, min_length=40,
+                                                          use_cache=not request.cache_bypass)
+        result = {
+            "papers": [{"paper_id": p.get('id'), "summary": summary}],
+            "comparison": summary,
+            "metrics": {"embedding_similarity": [[1.0]], "citation_overlap": [[1.0]], "keyword_overlap": [[1.0]]},
+            "evidence_graph": {'nodes': [{'id': p.get('id'), 'title': p.get('title'), 'authors': [], 'year': None}], 'edges': []},
+            "comparison_points": []
+        }
+        if not request.cache_bypass:
+            _comparison_cache.put(cache_key, result)
+        return ORJSONResponse(result)
 
     # Build a compare prompt combining titles and abstracts
     compare_text_parts = []
@@ -162,30 +273,30 @@ async def compare_papers(request: CompareRequest):
         compare_text_parts.append(mode_prompts.get(request.compare_mode or "full", mode_prompts["full"]))
 
     # Prepare semantic embeddings and overlap metrics
-    texts_for_embedding = [f"{p.get('title','')}\n{p.get('abstract','')}" for p in papers]
-    embeddings = ai_service.embed_texts(texts_for_embedding)
-
-    # compute pairwise embedding similarities
+    # Keywords are always extracted here, the same way for every paper, so the overlap metric
+    # compares like with like (indexed tags come from a different extraction or from the publisher).
+    # Embedding and per-paper keyword extraction run concurrently off the event loop
+    texts_for_embedding = [f"{p.get('title','')}\n{p.get('abstract','')}" for p in unique_papers]
+    unique_embs, unique_keywords = await asyncio.gather(
+        ai_service.embed_texts_async(texts_for_embedding),
+        asyncio.to_thread(ai_service.extract_keywords_batch,
+                          [p.get('abstract','') or p.get('title','') for p in unique_papers], 20)
+    )
+    paper_embs = unique_embs[rows]
+
+    # compute pairwise embedding similarities with a single matmul (rows are unit length)
     n = len(papers)
-    embedding_sim_matrix = [[0.0]*n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                embedding_sim_matrix[i][j] = 1.0
-            else:
-                embedding_sim_matrix[i][j] = ai_service.cosine_sim(embeddings[i], embeddings[j])
+    sim = np.clip(unique_embs @ unique_embs.T, -1.0, 1.0)[np.ix_(rows, rows)]
+    np.fill_diagonal(sim, 1.0)
+    embedding_sim_matrix = sim
 
     # citation and keyword overlap metrics
     # Extract references and keywords
-    refs = []
-    kw_sets = []
-    for p in papers:
+    unique_ref_sets = []
+    unique_kw_sets = []
+    for p, kws in zip(unique_papers, unique_keywords):
         # Prefer ES stored references; if absent, fall back to OpenAlex referenced_works
-        try:
-            doc = es.get(index=INDEX_NAME, id=p.get('id'))
-            src = doc.get('_source', {})
-        except Exception:
-            src = {}
+        src = sources.get(p.get('id'), {})
         r = src.get('references') or src.get('reference_ids') or []
         if (not r or len(r) == 0) and p.get('_oa'):
             # OpenAlex returns referenced_works as a list of ids
@@ -194,53 +305,59 @@ async def compare_papers(request: CompareRequest):
         if isinstance(r, str):
             # sometimes stored as a comma-separated string
             r = [x.strip() for x in r.split(',') if x.strip()]
-        refs.append(set([str(x) for x in (r or [])]))
-
-        kws = ai_service.extract_keywords(p.get('abstract','') or p.get('title',''), top_n=20)
-        kw_sets.append(set(kws))
+        unique_ref_sets.append(set([str(x) for x in (r or [])]))
+        unique_kw_sets.append(set(kws))
+    refs = [unique_ref_sets[row] for row in rows]
+    kw_sets = [unique_kw_sets[row] for row in rows]
 
     # pairwise citation overlap (normalized by min reference size)
-    citation_overlap = [[0.0]*n for _ in range(n)]
-    keyword_overlap = [[0.0]*n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                citation_overlap[i][j] = 1.0
-                keyword_overlap[i][j] = 1.0
-                continue
-            a_refs = refs[i]
-            b_refs = refs[j]
-            if a_refs and b_refs:
-                inter = a_refs.intersection(b_refs)
-                denom = min(len(a_refs), len(b_refs))
-                citation_overlap[i][j] = len(inter)/denom if denom > 0 else 0.0
-            else:
-                citation_overlap[i][j] = 0.0
-
-            a_kw = kw_sets[i]
-            b_kw = kw_sets[j]
-            if a_kw or b_kw:
-                interkw = a_kw.intersection(b_kw)
-                unionkw = a_kw.union(b_kw)
-                keyword_overlap[i][j] = len(interkw)/len(unionkw) if unionkw else 0.0
-            else:
-                keyword_overlap[i][j] = 0.0
+    # computed from 0/1 membership matrices: M @ M.T gives every pairwise intersection size
+    ref_inter, ref_sizes = _pairwise_intersections(unique_ref_sets)
+    ref_inter, ref_sizes = ref_inter[np.ix_(rows, rows)], ref_sizes[rows]
+    ref_denom = np.minimum(ref_sizes[:, None], ref_sizes[None, :])
+    citation_sim = np.where(ref_denom > 0, ref_inter / np.maximum(ref_denom, 1), 0.0)
+    np.fill_diagonal(citation_sim, 1.0)
+    citation_overlap = citation_sim
+
+    # pairwise keyword overlap (Jaccard)
+    kw_inter, kw_sizes = _pairwise_intersections(unique_kw_sets)
+    kw_inter, kw_sizes = kw_inter[np.ix_(rows, rows)], kw_sizes[rows]
+    kw_union = kw_sizes[:, None] + kw_sizes[None, :] - kw_inter
+    keyword_sim = np.where(kw_union > 0, kw_inter / np.maximum(kw_union, 1), 0.0)
+    np.fill_diagonal(keyword_sim, 1.0)
+    keyword_overlap = keyword_sim
 
     # Build an evidence-backed comparison graph
     # Nodes are the input papers; edges indicate shared/derivative ideas backed by citations
+    # Shared references per unordered pair i < j (capped at 10) and example refs per
+    # paper (capped at 3); collected up-front so their metadata is fetched in one mget.
+    shared_refs = {}
+    for i, j in zip(*np.nonzero(ref_inter)):
+        if i < j:
+            shared_refs[(int(i), int(j))] = list(islice(refs[i].intersection(refs[j]), 10))
+    example_ref_ids = [list(islice(r, 3)) for r in refs]
+
+    wanted_refs = [rid for rids in shared_refs.values() for rid in rids]
+    wanted_refs += [rid for rids in example_ref_ids for rid in rids]
+    ref_sources = await _fetch_sources(wanted_refs, fields=_REF_FIELDS)
+
+    # Refs missing from ES are resolved via OpenAlex concurrently rather than one by one
+    unique_refs = list(dict.fromkeys(wanted_refs))
+    missing_refs = [rid for rid in unique_refs if rid not in ref_sources]
+    ref_works = dict(zip(missing_refs, await resolve_works_async(missing_refs)))
+
     def _resolve_ref_meta(ref_id: str) -> Dict[str, Any]:
-        """Try to fetch metadata for a reference id from ES; fallback to raw id."""
-        try:
-            rdoc = es.get(index=INDEX_NAME, id=ref_id)
-            rsrc = rdoc.get('_source', {})
+        """Try to read metadata for a reference id from the prefetched ES/OpenAlex docs; fallback to raw id."""
+        rsrc = ref_sources.get(ref_id)
+        if rsrc is not None:
             title = rsrc.get('title') or rsrc.get('name')
             authors = rsrc.get('authors') or []
             year = rsrc.get('year') or rsrc.get('published')
             return {'id': str(ref_id), 'title': title, 'authors': authors, 'year': year}
-        except Exception:
-            # Try OpenAlex as a fallback to enrich reference metadata
+        else:
+            # Use the OpenAlex work as a fallback to enrich reference metadata
             try:
-                oa = resolve_work(ref_id)
+                oa = ref_works.get(ref_id)
                 if oa:
                     title = oa.get('display_name') or oa.get('title')
                     authors = []
@@ -261,6 +378,8 @@ async def compare_papers(request: CompareRequest):
             # best-effort: return id only
             return {'id': str(ref_id), 'title': str(ref_id), 'authors': [], 'year': None}
 
+    ref_meta = {rid: _resolve_ref_meta(rid) for rid in unique_refs}
+
     evidence_nodes = []
     for p in papers:
         evidence_nodes.append({'id': p.get('id'), 'title': p.get('title'), 'authors': [], 'year': None})
@@ -268,16 +387,12 @@ async def compare_papers(request: CompareRequest):
     evidence_edges = []
     # For each pair of papers, if they share references, add an edge with evidence
     for i in range(n):
-        for j in range(n):
-            if i == j:
-                continue
-            a_refs = refs[i]
-            b_refs = refs[j]
-            shared = a_refs.intersection(b_refs) if a_refs and b_refs else set()
+        for j in range(i + 1, n):
+            shared = shared_refs.get((i, j))
             if shared:
                 evidence_list = []
-                for rid in list(shared)[:10]:
-                    meta = _resolve_ref_meta(rid)
+                for rid in shared:
+                    meta = ref_meta[rid]
                     # Build a short human-friendly citation label
                     label = None
                     try:
@@ -300,21 +415,24 @@ async def compare_papers(request: CompareRequest):
 
                     evidence_list.append({'ref_id': meta.get('id'), 'label': label, 'meta': meta})
 
-                evidence_edges.append({
-                    'source': papers[i].get('id'),
-                    'target': papers[j].get('id'),
-                    'relation': 'shared_reference',
-                    'evidence': evidence_list
-                })
-
-            # direct citation: if paper i references paper j by id
-            if papers[j].get('id') in a_refs:
-                evidence_edges.append({
-                    'source': papers[i].get('id'),
-                    'target': papers[j].get('id'),
-                    'relation': 'cites',
-                    'evidence': []
-                })
+                # shared references are symmetric: emit both directions with the same evidence
+                for a, b in ((i, j), (j, i)):
+                    evidence_edges.append({
+                        'source': papers[a].get('id'),
+                        'target': papers[b].get('id'),
+                        'relation': 'shared_reference',
+                        'evidence': evidence_list
+                    })
+
+            # direct citation is directional: paper a references paper b by id
+            for a, b in ((i, j), (j, i)):
+                if papers[b].get('id') in refs[a]:
+                    evidence_edges.append({
+                        'source': papers[a].get('id'),
+                        'target': papers[b].get('id'),
+                        'relation': 'cites',
+                        'evidence': []
+                    })
 
     # Ensure we always return at least a non-empty evidence graph.
     # If no citation/shared-reference edges were found, synthesize semantic edges
@@ -323,7 +441,7 @@ async def compare_papers(request: CompareRequest):
     if not evidence_edges:
         for i in range(n):
             for j in range(i + 1, n):
-                score = embedding_sim_matrix[i][j] if i < len(embedding_sim_matrix) and j < len(embedding_sim_matrix[i]) else 0.0
+                score = float(embedding_sim_matrix[i, j])
                 shared_kw = list(kw_sets[i].intersection(kw_sets[j])) if i < len(kw_sets) and j < len(kw_sets) else []
                 evidence_item = {
                     'ref_id': f'semantic:{i}-{j}',
@@ -347,12 +465,14 @@ async def compare_papers(request: CompareRequest):
     compare_text = "\n---\n".join(compare_text_parts)
 
     # Generate per-paper summaries and an overall comparison using the summarization model
-    per_paper_summaries = []
-    for p in papers:
-        s = ai_service.generate_summary(p.get('abstract',''), max_length=150, min_length=40)
-        per_paper_summaries.append({"paper_id": p.get('id'), "summary": s})
-
-    comparison = ai_service.generate_summary(compare_text, max_length=request.max_length, min_length=request.min_length)
+    use_cache = not request.cache_bypass
+    summaries, comparison = await asyncio.gather(
+        ai_service.generate_summaries_async([p.get('abstract','') for p in papers], max_length=150, min_length=40,
+                                            use_cache=use_cache),
+        ai_service.generate_summary_async(compare_text, max_length=request.max_length,
+                                          min_length=request.min_length, use_cache=use_cache)
+    )
+    per_paper_summaries = [{"paper_id": p.get('id'), "summary": s} for p, s in zip(papers, summaries)]
 
     metrics = {
         "embedding_similarity": embedding_sim_matrix,
@@ -370,41 +490,35 @@ async def compare_papers(request: CompareRequest):
     def _split_sentences(text: str):
         if not text:
             return []
-        import re
-        parts = re.split(r"\n|\r|(?<=[\.\?\!])\s+", text)
+        parts = _SENT_SPLIT_RE.split(text)
         parts = [p.strip() for p in parts if p and len(p.strip()) > 20]
         return parts
 
     comparison_points = []
     sentences = _split_sentences(comparison)
     # embed sentences and reuse paper embeddings
-    sent_embs = ai_service.embed_texts(sentences) if sentences else []
+    sent_embs = await ai_service.embed_texts_async(sentences)
 
     support_threshold = 0.45
+    # score every sentence against every paper in one matmul
+    support_scores = sent_embs @ paper_embs.T
+
     for si, sent in enumerate(sentences):
         supports = []
-        se = sent_embs[si] if si < len(sent_embs) else None
-        for pi in range(len(papers)):
-            score = 0.0
-            if se is not None and embeddings and pi < len(embeddings):
-                try:
-                    score = ai_service.cosine_sim(se, embeddings[pi])
-                except Exception:
-                    score = 0.0
-
-            if score >= support_threshold:
-                # collect example refs for this paper (up to 3)
-                example_refs = []
-                try:
-                    ref_ids = list(refs[pi])[:3]
-                except Exception:
-                    ref_ids = []
-                for rid in ref_ids:
-                    meta = _resolve_ref_meta(rid)
-                    example_refs.append({'ref_id': meta.get('id'), 'label': (meta.get('title') or meta.get('id')), 'meta': meta})
-
-                supports.append({'paper_id': papers[pi].get('id'), 'score': float(score), 'example_refs': example_refs})
+        for pi in np.flatnonzero(support_scores[si] >= support_threshold):
+            score = support_scores[si, pi]
+            # collect example refs for this paper (up to 3)
+            example_refs = []
+            for rid in example_ref_ids[pi]:
+                meta = ref_meta[rid]
+                example_refs.append({'ref_id': meta.get('id'), 'label': (meta.get('title') or meta.get('id')), 'meta': meta})
+
+            supports.append({'paper_id': papers[pi].get('id'), 'score': float(score), 'example_refs': example_refs})
 
         comparison_points.append({'text': sent, 'supports': supports})
 
-    return {"papers": per_paper_summaries, "comparison": comparison, "metrics": metrics, "evidence_graph": evidence_graph, "comparison_points": comparison_points}
\ No newline at end of file
+    result = {"papers": per_paper_summaries, "comparison": comparison, "metrics": metrics, "evidence_graph": evidence_graph, "comparison_points": comparison_points}
+    if not request.cache_bypass:
+        _comparison_cache.put(cache_key, result)
+    # matrices stay ndarrays; ORJSONResponse serializes them natively (OPT_SERIALIZE_NUMPY)
+    return ORJSONResponse(result)
\ No newline at end of file
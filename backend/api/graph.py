@@ -1,11 +1,16 @@
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, HTTPException, Query
 
-from app.services.arxiv_ingest import es, INDEX_NAME
-from app.services.openalex import resolve_work, get_citing_works, get_referenced_works
+from app.services.arxiv_ingest import async_es, INDEX_NAME
+from app.services.openalex import resolve_work, get_citing_works
 
 router = APIRouter()
 
+# Only the fields read by _node_from_source are requested from ES
+_NODE_SOURCE_FIELDS = ['id', 'paper_id', 'doi', 'title', 'name', 'authors', 'year', 'published', 'url', 'pdf_url']
+# The target paper also supplies the keys used to find its citing and similar papers
+_TARGET_SOURCE_FIELDS = _NODE_SOURCE_FIELDS + ['openalex_id', 'keywords']
+
 
 def _node_from_source(src: dict) -> dict:
     pid = str(src.get('id') or src.get('paper_id') or src.get('doi') or src.get('title'))
@@ -24,24 +29,29 @@ async def get_citations(paper_id: str = Query(..., description='Paper ID to find
     try:
         # try to fetch target paper from ES
         try:
-            tgt = es.get(index=INDEX_NAME, id=paper_id)
+            tgt = await async_es.get(index=INDEX_NAME, id=paper_id, _source_includes=_TARGET_SOURCE_FIELDS)
             tgt_src = tgt.get('_source', {})
         except Exception:
             tgt_src = {}
 
-        # find papers that cite this paper via references field if available
+        # find papers that cite this paper via exact reference keys (id, DOI, OpenAlex id)
+        ref_keys = [k for k in dict.fromkeys([paper_id, tgt_src.get('doi'), tgt_src.get('openalex_id')]) if k]
         q = {
             'query': {
-                'term': {
-                    'references': {
-                        'value': paper_id
-                    }
+                'bool': {
+                    'should': [
+                        {'terms': {'references': ref_keys}},
+                        {'terms': {'references.keyword': ref_keys}}
+                    ],
+                    'minimum_should_match': 1
                 }
             },
+            '_source': _NODE_SOURCE_FIELDS,
+            'track_total_hits': False,
             'size': limit
         }
 
-        resp = es.search(index=INDEX_NAME, body=q)
+        resp = await async_es.search(index=INDEX_NAME, body=q)
         hits = resp.get('hits', {}).get('hits', [])
 
         # Fallback: if no explicit 'references' field is available in index,
@@ -71,9 +81,11 @@ async def get_citations(paper_id: str = Query(..., description='Paper ID to find
                             'minimum_should_match': 1
                         }
                     },
+                    '_source': _NODE_SOURCE_FIELDS,
+                    'track_total_hits': False,
                     'size': limit
                 }
-                resp = es.search(index=INDEX_NAME, body=fq)
+                resp = await async_es.search(index=INDEX_NAME, body=fq)
                 hits = resp.get('hits', {}).get('hits', [])
 
         nodes = []
@@ -143,7 +155,7 @@ async def get_similar(paper_id: str = Query(..., description='Paper ID to find s
     """
     try:
         try:
-            tgt = es.get(index=INDEX_NAME, id=paper_id)
+            tgt = await async_es.get(index=INDEX_NAME, id=paper_id, _source_includes=_TARGET_SOURCE_FIELDS)
             tgt_src = tgt.get('_source', {})
         except Exception:
             tgt_src = {}
@@ -164,10 +176,12 @@ async def get_similar(paper_id: str = Query(..., description='Paper ID to find s
                     'minimum_should_match': 1
                 }
             },
+            '_source': _NODE_SOURCE_FIELDS,
+            'track_total_hits': False,
             'size': limit
         }
 
-        resp = es.search(index=INDEX_NAME, body=q)
+        resp = await async_es.search(index=INDEX_NAME, body=q)
         hits = resp.get('hits', {}).get('hits', [])
 
         nodes = []
@@ -1,8 +1,8 @@
 from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
-from app.services.novelty import novelty_service
+from app.services.novelty import NoveltyService, get_novelty_service
 
 router = APIRouter()
 
@@ -14,7 +14,7 @@ class NoveltyRequest(BaseModel):
 
 
 @router.post('/score')
-async def score_novelty(req: NoveltyRequest):
+async def score_novelty(req: NoveltyRequest, novelty_service: NoveltyService = Depends(get_novelty_service)):
     if not req.title and not req.abstract:
         raise HTTPException(status_code=400, detail='Provide at least a title or abstract')
 
@@ -1,11 +1,14 @@
 from typing import List, Dict, Any, Optional
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 
-from app.services.recommendations import RecommendationService
+from app.services.cache import TTLCache
+from app.services.recommendations import RecommendationService, get_recommendation_service
 
 router = APIRouter()
-recommendation_service = RecommendationService()
+# (topic, limit) -> trending papers; trending changes slowly, so a short TTL is enough
+_trending_cache = TTLCache(maxsize=256, ttl=60)
 
 class RecommendationResponse(BaseModel):
     """Model for recommendation response"""
@@ -16,18 +19,21 @@ class RecommendationResponse(BaseModel):
 async def get_recommendations_for_user(
     user_id: int,
     recommendation_type: str = Query("hybrid", description="Type: content, collaborative, or hybrid"),
-    limit: int = Query(10, description="Number of recommendations to return")
+    limit: int = Query(10, description="Number of recommendations to return"),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
     """
     Get personalized paper recommendations for a user
     """
     try:
+        # Recommendation calls hit ES and the embedding model, so run them off the event loop
         if recommendation_type == "content":
-            papers = recommendation_service.get_content_based_recommendations(user_id, limit=limit)
+            recommend = recommendation_service.get_content_based_recommendations
         elif recommendation_type == "collaborative":
-            papers = recommendation_service.get_collaborative_recommendations(user_id, limit=limit)
+            recommend = recommendation_service.get_collaborative_recommendations
         else:  # hybrid (default)
-            papers = recommendation_service.get_hybrid_recommendations(user_id, limit=limit)
+            recommend = recommendation_service.get_hybrid_recommendations
+        papers = await asyncio.to_thread(recommend, user_id, limit=limit)
         
         # Ensure diversity in recommendations
         diverse_papers = recommendation_service.diversify_recommendations(papers, limit=limit)
@@ -42,13 +48,17 @@ async def get_recommendations_for_user(
 @router.get("/trending", response_model=RecommendationResponse)
 async def get_trending_papers(
     topic: Optional[str] = Query(None, description="Filter by topic"),
-    limit: int = Query(10, description="Number of papers to return")
+    limit: int = Query(10, description="Number of papers to return"),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service)
 ):
     """
     Get trending papers overall or in a specific topic
     """
     try:
-        papers = recommendation_service.get_trending_papers(topic=topic, limit=limit)
+        papers = _trending_cache.get((topic, limit))
+        if papers is None:
+            papers = await asyncio.to_thread(recommendation_service.get_trending_papers, topic=topic, limit=limit)
+            _trending_cache.put((topic, limit), papers)
         
         return RecommendationResponse(
             papers=papers,
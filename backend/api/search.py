@@ -1,11 +1,18 @@
 from typing import List, Dict, Any, Optional
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 
-from app.services.search import SearchService
+from app.services.arxiv_ingest import async_es, INDEX_NAME
+from app.services.cache import TTLCache, content_key
+from app.services.search import SearchService, get_search_service
 
 router = APIRouter()
-search_service = SearchService()
+# Reranked results per (query, type, page, size, filters); results only go stale as papers are ingested
+_search_cache = TTLCache(maxsize=1024, ttl=60)
+# (normalized prefix, size) -> suggestions, for prefixes up to AUTOCOMPLETE_CACHE_PREFIX chars
+_autocomplete_cache = TTLCache(maxsize=10_000, ttl=300)
+AUTOCOMPLETE_CACHE_PREFIX = 32
 
 class SearchFilters(BaseModel):
     """Model for search filters"""
@@ -22,13 +29,21 @@ class SearchResponse(BaseModel):
     page: int
     size: int
 
+# Fields fetched only so results can be reranked; they are not part of the response
+_RERANK_ONLY_FIELDS = frozenset(SearchService.EMBEDDING_SOURCE_FIELDS) - frozenset(SearchService.LIST_SOURCE_FIELDS)
+
+def _for_response(paper: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a hit without the stored vector and the other rerank-only fields"""
+    return {k: v for k, v in paper.items() if k not in _RERANK_ONLY_FIELDS}
+
 @router.get("/", response_model=SearchResponse)
 async def search(
     q: str = Query(..., description="Search query"),
     search_type: str = Query("hybrid", description="Search type: keyword, vector, or hybrid"),
     page: int = Query(1, description="Page number"),
     size: int = Query(10, description="Results per page"),
-    filters: Optional[SearchFilters] = None
+    filters: Optional[SearchFilters] = None,
+    search_service: SearchService = Depends(get_search_service)
 ):
     """
     Search for research papers using keyword, vector, or hybrid search
@@ -39,25 +54,35 @@ async def search(
         
         # Calculate offset
         offset = (page - 1) * size
+
+        cache_key = content_key(q, search_type, page, size, sorted(filter_dict.items()) if filter_dict else None)
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-        # Perform search based on type
+        # Perform search based on type (ES and the embedding model block, so run off the event loop).
+        # Hits carry their stored embeddings so rerank_results can score them against the query
         if search_type == "keyword":
-            results = search_service.keyword_search(q, filter_dict, size=size)
+            results = await asyncio.to_thread(search_service.keyword_search, q, filter_dict, size=size,
+                                              include_embeddings=True)
         elif search_type == "vector":
-            results = search_service.vector_search(q, size=size)
+            results = await asyncio.to_thread(search_service.vector_search, q, size=size)
         else:  # hybrid (default)
-            results = search_service.hybrid_search(q, filter_dict, size=size)
+            results = await asyncio.to_thread(search_service.hybrid_search, q, filter_dict, size=size,
+                                              include_embeddings=True)
         
-        # Rerank results for better relevance
-        reranked_results = search_service.rerank_results(q, results, size=size)
+        # Rerank results for better relevance, then drop the vectors from the response
+        reranked_results = await asyncio.to_thread(search_service.rerank_results, q, results, size=size)
+        reranked_results = [_for_response(r) for r in reranked_results]
         
-        # Return response
-        return SearchResponse(
+        response = SearchResponse(
             results=reranked_results,
             total=len(results),  # In a real implementation, get total from ES
             page=page,
             size=size
         )
+        _search_cache.put(cache_key, response)
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
@@ -69,14 +94,28 @@ async def autocomplete(
     """
     Get autocomplete suggestions for search queries
     """
-    # This is a placeholder - in a real implementation, you would use
-    # Elasticsearch's completion suggester or similar
-    suggestions = [
-        f"{q} research",
-        f"{q} papers",
-        f"{q} methodology",
-        f"{q} review",
-        f"{q} analysis"
-    ]
+    # The suggester lowercases input, so normalize the cache key the same way
+    prefix = q.strip().lower()
+    # Keystroke traffic is short prefixes; longer ones are rare and would only bloat the keys
+    cacheable = len(prefix) <= AUTOCOMPLETE_CACHE_PREFIX
+    suggestions = _autocomplete_cache.get((prefix, size)) if cacheable else None
+    if suggestions is None:
+        body = {
+            "_source": False,
+            "suggest": {
+                "titles": {
+                    "prefix": prefix,
+                    "completion": {"field": "suggest", "size": size, "skip_duplicates": True}
+                }
+            }
+        }
+        try:
+            resp = await async_es.search(index=INDEX_NAME, body=body)
+            suggestions = [opt["text"] for opt in resp["suggest"]["titles"][0]["options"]]
+            if cacheable:
+                _autocomplete_cache.put((prefix, size), suggestions)
+        except Exception:
+            # Index without a `suggest` completion field (or ES unavailable): no suggestions
+            suggestions = []
     
-    return {"suggestions": suggestions[:size]}
\ No newline at end of file
+    return {"suggestions": suggestions}
\ No newline at end of file
@@ -13,6 +13,10 @@ class Settings(BaseSettings):
     ELASTICSEARCH_HOST: str = os.getenv("ELASTICSEARCH_HOST", "localhost")
     ELASTICSEARCH_PORT: int = int(os.getenv("ELASTICSEARCH_PORT", "9200"))
     ELASTICSEARCH_INDEX_PAPERS: str = "papers"
+    ELASTICSEARCH_USER: str = os.getenv("ELASTICSEARCH_USER", "elastic")
+    ELASTICSEARCH_PASSWORD: str = os.getenv("ELASTICSEARCH_PASSWORD", "")
+    # Pooled HTTP connections per ES node for the async client
+    ELASTICSEARCH_MAX_CONNECTIONS: int = int(os.getenv("ELASTICSEARCH_MAX_CONNECTIONS", "25"))
     
     # Vector search
     VECTOR_DIMENSION: int = 768  # Default for BERT-based embeddings
@@ -25,10 +29,20 @@ class Settings(BaseSettings):
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
     
+    # Contact email sent to OpenAlex (polite pool); optional
+    OPENALEX_EMAIL: str = os.getenv("OPENALEX_EMAIL", "")
+
     # AI Models
     EMBEDDING_MODEL: str = "sentence-transformers/all-mpnet-base-v2"
-    SUMMARIZATION_MODEL: str = "facebook/bart-large-cnn"
+    # Distilled BART (6 encoder / 6 decoder layers) trained on the same CNN/DM data as bart-large-cnn
+    SUMMARIZATION_MODEL: str = os.getenv("SUMMARIZATION_MODEL", "sshleifer/distilbart-cnn-6-6")
     QA_MODEL: str = "deepset/roberta-base-squad2"
+    # Dynamically quantize the summarization/QA Linear layers to INT8 for CPU inference
+    QUANTIZE: bool = os.getenv("QUANTIZE", "true").lower() in ("1", "true", "yes")
+    # Intra-op threads used by torch; 0 keeps torch's default
+    TORCH_NUM_THREADS: int = int(os.getenv("TORCH_NUM_THREADS", "0"))
+    # Embedding precision: auto (float16 on GPU, float32 on CPU), float32, float16 or bfloat16
+    EMBEDDING_DTYPE: str = os.getenv("EMBEDDING_DTYPE", "auto")
     
     class Config:
         case_sensitive = True
@@ -3,7 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uvicorn
-from app.services.search import SearchService
+import asyncio
+from app.services.search import get_search_service
 from app.services.ai_features import get_ai_service
 from app.services.arxiv_ingest import es, INDEX_NAME
 from app.api.endpoints.novelty import router as novelty_router
@@ -16,7 +17,7 @@ import traceback
 logger = logging.getLogger("autoscolar")
 search_service = None
 try:
-    search_service = SearchService()
+    search_service = get_search_service()
 except Exception as e:
     # Log full traceback to help debugging (will appear in uvicorn logs)
     logger.exception("Failed to initialize SearchService: %s", e)
@@ -95,12 +96,13 @@ async def search_papers_v1(query: SearchQuery):
             logger.warning("SearchService unavailable; returning mock results to frontend")
             return {"results": mock_papers, "count": len(mock_papers)}
 
+        # Searches block on ES and the embedding model, so run them off the event loop
         if query.search_type == "keyword":
-            results = search_service.keyword_search(query.query, size=query.limit)
+            results = await asyncio.to_thread(search_service.keyword_search, query.query, size=query.limit)
         elif query.search_type == "vector":
-            results = search_service.vector_search(query.query, size=query.limit)
+            results = await asyncio.to_thread(search_service.vector_search, query.query, size=query.limit)
         else:  # hybrid
-            results = search_service.hybrid_search(query.query, size=query.limit)
+            results = await asyncio.to_thread(search_service.hybrid_search, query.query, size=query.limit)
 
         return {"results": results, "count": len(results)}
 
@@ -149,7 +151,7 @@ async def answer_question(paper_id: str, question: str):
 @app.post("/api/ai/summarize-papers")
 async def summarize_papers(paper_ids: List[str], max_length: int = 200, min_length: int = 40):
     ai = get_ai_service()
-    summaries = []
+    texts = []
     for pid in paper_ids:
         try:
             doc = es.get(index=INDEX_NAME, id=pid)
@@ -157,7 +159,9 @@ async def summarize_papers(paper_ids: List[str], max_length: int = 200, min_leng
             text = src.get('abstract') or src.get('summary') or src.get('description') or src.get('title') or ''
         except Exception:
             text = ''
-        summaries.append({"paper_id": pid, "summary": ai.generate_summary(text, max_length=max_length, min_length=min_length)})
+        texts.append(text)
+    outputs = ai.generate_summaries(texts, max_length=max_length, min_length=min_length)
+    summaries = [{"paper_id": pid, "summary": s} for pid, s in zip(paper_ids, outputs)]
     return {"summaries": summaries}
 
 
@@ -187,7 +191,8 @@ async def compare_papers(
         parts.append("Summarize differences and similarities focusing on methods, data, results, and conclusions.\n")
 
     compare_text = "\n---\n".join(parts)
-    per_summaries = [{"paper_id": p['id'], "summary": ai.generate_summary(p['abstract'], max_length=150, min_length=40)} for p in papers]
+    summaries = ai.generate_summaries([p['abstract'] for p in papers], max_length=150, min_length=40)
+    per_summaries = [{"paper_id": p['id'], "summary": s} for p, s in zip(papers, summaries)]
     comparison = ai.generate_summary(compare_text, max_length=max_length, min_length=min_length)
     return {"papers": per_summaries, "comparison": comparison}
 
@@ -1,4 +1,7 @@
 from typing import List, Dict, Any, Optional
+from collections import Counter
+import re
+import threading
 import numpy as np
 import torch
 from transformers import (
@@ -7,49 +10,179 @@ from transformers import (
     AutoModelForQuestionAnswering,
     pipeline
 )
-from sentence_transformers import SentenceTransformer
 
 from app.core.config import settings
+from app.services.batching import MicroBatcher
+from app.services.cache import LRUCache, content_key
+from app.services.embeddings import EMBEDDING_CACHE_SIZE, encode_cached, get_embedder
+
+# Keyword candidates: runs of 4+ letters (Unicode-aware; digits, underscores and punctuation excluded)
+_KEYWORD_RE = re.compile(r"[^\W\d_]{4,}")
+
+
+def extract_keywords(text: str, top_n: int = 10) -> List[str]:
+    """Most frequent keyword candidates in text; needs no models, so ingestion can call it directly"""
+    # most_common uses a bounded heap instead of a full sort
+    word_freq = Counter(_KEYWORD_RE.findall(text.lower()))
+    return [word for word, _ in word_freq.most_common(top_n)]
+
+
+def auto_tag(title: str, abstract: str, top_n: int = 5) -> List[str]:
+    """Tags for a paper from its title and abstract (indexed as `keywords` at ingest time)"""
+    return extract_keywords(f"{title}. {abstract}", top_n=top_n)
 
 class AIFeatureService:
     """Service for AI-powered features like summarization and question-answering"""
+
+    # Max number of summaries kept in the in-process LRU cache
+    SUMMARY_CACHE_SIZE = 2_048
+    # Texts shorter than this many times min_length (in tokens) are returned as-is:
+    # the summary would be close to the input, so the decoder pass isn't worth it
+    SHORT_TEXT_FACTOR = 3
     
     def __init__(self):
+        if settings.TORCH_NUM_THREADS > 0:
+            # Pin intra-op threads so concurrent batches don't oversubscribe the cores
+            torch.set_num_threads(settings.TORCH_NUM_THREADS)
+
         # Initialize summarization model
         self.summarization_tokenizer = AutoTokenizer.from_pretrained(settings.SUMMARIZATION_MODEL)
-        self.summarization_model = AutoModelForSeq2SeqLM.from_pretrained(settings.SUMMARIZATION_MODEL)
+        self.summarization_model = self._maybe_quantize(
+            AutoModelForSeq2SeqLM.from_pretrained(settings.SUMMARIZATION_MODEL)
+        )
         self.summarizer = pipeline("summarization", model=self.summarization_model, tokenizer=self.summarization_tokenizer)
+        # The summarizer pipeline and its fast tokenizer are not thread-safe: concurrent calls that
+        # change truncation/padding fail with "Already borrowed". Every batcher and to_thread call
+        # shares this one model, so every summarizer call takes this lock
+        self._summary_lock = threading.Lock()
+        # Separate tokenizer for the short-text check. It is only ever called with the same
+        # settings, so it never reconfigures itself and can count tokens without the lock
+        self._count_tokenizer = AutoTokenizer.from_pretrained(settings.SUMMARIZATION_MODEL)
         
         # Initialize QA model
         self.qa_tokenizer = AutoTokenizer.from_pretrained(settings.QA_MODEL)
-        self.qa_model = AutoModelForQuestionAnswering.from_pretrained(settings.QA_MODEL)
+        self.qa_model = self._maybe_quantize(AutoModelForQuestionAnswering.from_pretrained(settings.QA_MODEL))
         self.qa_pipeline = pipeline("question-answering", model=self.qa_model, tokenizer=self.qa_tokenizer)
 
         # Embedding model (sentence-transformers)
         # Load lazily because it can be large; initialize here for simplicity.
         try:
-            self.embedder = SentenceTransformer(settings.EMBEDDING_MODEL)
+            self.embedder = get_embedder(settings.EMBEDDING_MODEL)
         except Exception as e:
             print(f"Embedding model load failed: {e}")
             self.embedder = None
+        # sha256(text) -> embedding, so repeated comparisons skip the encoder
+        self._embedding_cache = LRUCache(EMBEDDING_CACHE_SIZE)
+        # sha256(text, max_length, min_length) -> summary
+        self._summary_cache = LRUCache(self.SUMMARY_CACHE_SIZE)
+
+        # Coalesce concurrent requests into shared forward passes (see *_async methods)
+        self._embed_batcher = MicroBatcher(self.embed_texts)
+        # One summary batcher for every length setting: items carry their own generation lengths
+        self._summary_batcher = MicroBatcher(self._summarize_items)
+
+    @staticmethod
+    def _maybe_quantize(model: torch.nn.Module) -> torch.nn.Module:
+        """Apply INT8 dynamic quantization to a model's Linear layers when enabled and running on CPU"""
+        if not settings.QUANTIZE or torch.cuda.is_available():
+            return model
+        try:
+            return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            print(f"Model quantization failed, using FP32: {e}")
+            return model
     
-    def generate_summary(self, text: str, max_length: int = 150, min_length: int = 40) -> str:
+    def generate_summary(self, text: str, max_length: int = 150, min_length: int = 40,
+                         use_cache: bool = True) -> str:
         """Generate a concise summary of the given text"""
         # Check if text is too short for summarization
-        if len(text.split()) < min_length:
+        if self._token_count(text) < min_length * self.SHORT_TEXT_FACTOR:
             return text
+
+        key = content_key(text, max_length, min_length)
+        if use_cache:
+            cached = self._summary_cache.get(key)
+            if cached is not None:
+                return cached
         
         try:
-            summary = self.summarizer(
-                text, 
-                max_length=max_length, 
-                min_length=min_length, 
-                do_sample=False
-            )
-            return summary[0]['summary_text']
+            with self._summary_lock:
+                summary = self.summarizer(
+                    text, 
+                    max_length=max_length, 
+                    min_length=min_length, 
+                    do_sample=False
+                )
         except Exception as e:
             print(f"Summarization error: {str(e)}")
-            return text[:max_length * 10]  # Fallback to truncation
+            return self._truncate(text, max_length * 10)  # Fallback to truncation
+        result = summary[0]['summary_text']
+        self._summary_cache.put(key, result)
+        return result
+
+    def generate_summaries(self, texts: List[str], max_length: int = 150, min_length: int = 40,
+                           batch_size: int = 32, use_cache: bool = True) -> List[str]:
+        """Generate summaries for several texts, running the model in padded batches"""
+        summaries = list(texts)
+        keys = [content_key(t, max_length, min_length) for t in texts]
+        # key -> positions of every input with that text, so duplicates are generated once
+        pending: Dict[str, List[int]] = {}
+        token_counts = self._token_counts(texts)
+        for i, t in enumerate(texts):
+            # Texts too short for summarization are returned unchanged, as in generate_summary
+            if token_counts[i] < min_length * self.SHORT_TEXT_FACTOR:
+                continue
+            cached = self._summary_cache.get(keys[i]) if use_cache else None
+            if cached is not None:
+                summaries[i] = cached
+            else:
+                pending.setdefault(keys[i], []).append(i)
+
+        pending_keys = list(pending)
+        for start in range(0, len(pending_keys), batch_size):
+            chunk = pending_keys[start:start + batch_size]
+            try:
+                with self._summary_lock:
+                    outputs = self.summarizer(
+                        [texts[pending[k][0]] for k in chunk],
+                        max_length=max_length,
+                        min_length=min_length,
+                        do_sample=False,
+                        batch_size=len(chunk)
+                    )
+                results = [out['summary_text'] for out in outputs]
+                for k, result in zip(chunk, results):
+                    self._summary_cache.put(k, result)
+            except Exception as e:
+                print(f"Batch summarization error: {str(e)}")
+                results = [
+                    self.generate_summary(texts[pending[k][0]], max_length=max_length, min_length=min_length,
+                                          use_cache=False)
+                    for k in chunk
+                ]
+            for k, result in zip(chunk, results):
+                for i in pending[k]:
+                    summaries[i] = result
+        return summaries
+
+    def _token_count(self, text: str) -> int:
+        return self._token_counts([text])[0]
+
+    def _token_counts(self, texts: List[str]) -> List[int]:
+        """Number of summarization-model tokens in each text (no special tokens, no truncation)"""
+        if not texts:
+            return []
+        encoded = self._count_tokenizer(list(texts), add_special_tokens=False, truncation=False)
+        return [len(ids) for ids in encoded['input_ids']]
+
+    @staticmethod
+    def _truncate(text: str, max_chars: int) -> str:
+        """Cut text to at most max_chars, ending at the last sentence boundary when there is one"""
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max_chars]
+        end = max(cut.rfind('. '), cut.rfind('! '), cut.rfind('? '))
+        return cut[:end + 1] if end > 0 else cut
     
     def answer_question(self, question: str, context: str) -> Dict[str, Any]:
         """Answer a question based on the provided context"""
@@ -79,55 +212,79 @@ class AIFeatureService:
         # a keyword extraction model or algorithm like RAKE, YAKE, or KeyBERT
         
         # Simple frequency-based extraction for demonstration
-        words = text.lower().split()
-        word_freq = {}
-        
-        for word in words:
-            if len(word) > 3:  # Filter out short words
-                word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # Sort by frequency
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        
-        # Return top N keywords
-        return [word for word, _ in sorted_words[:top_n]]
+        return extract_keywords(text, top_n=top_n)
+
+    def extract_keywords_batch(self, texts: List[str], top_n: int = 10) -> List[List[str]]:
+        """Extract keywords for several texts in one call"""
+        return [extract_keywords(text, top_n=top_n) for text in texts]
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Return L2-normalized embeddings for a list of texts as an (N, D) float32 array.
 
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """Return embedding vectors for a list of texts using sentence-transformers."""
+        Rows are unit length, so cosine similarity between rows is a plain dot product.
+        """
         if not texts:
-            return []
+            return np.zeros((0, settings.VECTOR_DIMENSION), dtype=np.float32)
         if self.embedder is None:
             # Attempt to lazy-load if not present
             try:
-                self.embedder = SentenceTransformer(settings.EMBEDDING_MODEL)
+                self.embedder = get_embedder(settings.EMBEDDING_MODEL)
             except Exception as e:
                 print(f"Failed to load embedder: {e}")
-                return [[0.0] * settings.VECTOR_DIMENSION for _ in texts]
+                return np.zeros((len(texts), settings.VECTOR_DIMENSION), dtype=np.float32)
+
+        # Only texts whose embeddings are not cached yet go through the encoder
+        return encode_cached(self.embedder, texts, self._embedding_cache)
+
+    async def embed_texts_async(self, texts: List[str]) -> np.ndarray:
+        """Like embed_texts, but batched together with other concurrent callers off the event loop"""
+        if not texts:
+            return np.zeros((0, settings.VECTOR_DIMENSION), dtype=np.float32)
+        rows = await self._embed_batcher.submit_many(texts)
+        return np.ascontiguousarray(np.stack(rows), dtype=np.float32)
+
+    def _summarize_items(self, items: List[tuple]) -> List[str]:
+        """Batch function for the summary batcher: items are (text, max_length, min_length, use_cache).
 
-        embs = self.embedder.encode(texts, convert_to_numpy=True, show_progress_bar=False)
-        # Ensure list of lists
-        return [list(map(float, e)) for e in embs]
+        Generation length and cache use are per-call pipeline arguments, so items are grouped by
+        them and each group goes through generate_summaries; results come back in item order.
+        """
+        groups: Dict[tuple, List[int]] = {}
+        for i, (_, max_length, min_length, use_cache) in enumerate(items):
+            groups.setdefault((max_length, min_length, use_cache), []).append(i)
+        results: List[Optional[str]] = [None] * len(items)
+        for (max_length, min_length, use_cache), positions in groups.items():
+            summaries = self.generate_summaries([items[i][0] for i in positions], max_length=max_length,
+                                                min_length=min_length, use_cache=use_cache)
+            for i, summary in zip(positions, summaries):
+                results[i] = summary
+        return results
+
+    async def generate_summaries_async(self, texts: List[str], max_length: int = 150, min_length: int = 40,
+                                       use_cache: bool = True) -> List[str]:
+        """Like generate_summaries, but batched together with other concurrent callers off the event loop"""
+        return await self._summary_batcher.submit_many(
+            [(text, max_length, min_length, use_cache) for text in texts]
+        )
+
+    async def generate_summary_async(self, text: str, max_length: int = 150, min_length: int = 40,
+                                     use_cache: bool = True) -> str:
+        """Async single-text counterpart of generate_summary"""
+        summaries = await self.generate_summaries_async([text], max_length, min_length, use_cache=use_cache)
+        return summaries[0]
 
     @staticmethod
     def cosine_sim(a: List[float], b: List[float]) -> float:
-        a_np = np.array(a, dtype=float)
-        b_np = np.array(b, dtype=float)
+        a_np = np.asarray(a, dtype=np.float32)
+        b_np = np.asarray(b, dtype=np.float32)
         if a_np.size == 0 or b_np.size == 0:
             return 0.0
-        denom = (np.linalg.norm(a_np) * np.linalg.norm(b_np))
-        if denom == 0:
-            return 0.0
-        return float(np.dot(a_np, b_np) / denom)
+        # epsilon keeps zero vectors at 0.0 instead of dividing by zero
+        return float(np.dot(a_np, b_np) / (np.sqrt(np.dot(a_np, a_np)) * np.sqrt(np.dot(b_np, b_np)) + 1e-12))
     
     def auto_tag_paper(self, title: str, abstract: str) -> List[str]:
         """Automatically generate tags for a paper based on title and abstract"""
-        # Combine title and abstract for processing
-        full_text = f"{title}. {abstract}"
-        
-        # Extract keywords
-        keywords = self.extract_keywords(full_text, top_n=5)
-        
-        return keywords
+        return auto_tag(title, abstract)
 
 
 # Lazy singleton for AIFeatureService to avoid reloading models on every import
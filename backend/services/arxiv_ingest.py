@@ -1,52 +1,121 @@
+import asyncio
+from itertools import islice
 import arxiv
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+from elasticsearch.helpers import async_bulk
 from app.core.config import settings
+from app.services.ai_features import auto_tag
+from app.services.embeddings import encode_context, get_embedder
 
-# Connect to Elasticsearch with HTTPS and authentication
-es = Elasticsearch(
+# Connection settings shared by the sync and async clients (HTTPS with basic auth)
+_ES_OPTIONS = dict(
     hosts=[{
         'host': settings.ELASTICSEARCH_HOST,
         'port': settings.ELASTICSEARCH_PORT,
         'scheme': 'https'
     }],
-    basic_auth=("elastic", "BnKf5CZd4MIVY=Cg-MQ0"),  # <-- Replace <your-password> with your actual password
-    verify_certs=False  # For local dev, disables SSL verification
+    basic_auth=(settings.ELASTICSEARCH_USER, settings.ELASTICSEARCH_PASSWORD),
+    verify_certs=False,  # For local dev, disables SSL verification
+    http_compress=True  # gzip request bodies; bulk payloads compress well
 )
 
+# Sync client for scripts and code running in worker threads
+es = Elasticsearch(**_ES_OPTIONS)
+# Async client with a connection pool for use from request handlers via `await`
+async_es = AsyncElasticsearch(**_ES_OPTIONS, connections_per_node=settings.ELASTICSEARCH_MAX_CONNECTIONS)
+
 INDEX_NAME = settings.ELASTICSEARCH_INDEX_PAPERS
+# Documents per bulk request
+BULK_CHUNK_SIZE = 500
+# arXiv API maximum page size; fewer pages means fewer rate-limited round trips
+ARXIV_PAGE_SIZE = 1000
+# Explicit mappings for fields dynamic mapping can't infer; everything else stays dynamic
+INDEX_MAPPINGS = {
+    "properties": {
+        # FST-backed prefix lookups for /search/autocomplete
+        "suggest": {"type": "completion"},
+        # Tags computed at ingest; full-text for search, exact values for aggregations/overlap
+        "keywords": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+        # Normalized title+abstract embedding, so consumers read vectors instead of re-encoding
+        "embedding": {
+            "type": "dense_vector",
+            "dims": settings.VECTOR_DIMENSION,
+            "index": True,
+            "similarity": "cosine"
+        }
+    }
+}
 
-def fetch_arxiv_papers(query="BERT", max_results=100):
-    client = arxiv.Client()
+def suggest_field(title, keywords=None):
+    """Build the completion-suggester entry for a paper from its title and keywords"""
+    inputs = [s for s in [title, *(keywords or [])] if isinstance(s, str) and s.strip()]
+    return {"input": inputs}
+
+def add_embeddings(papers, batch_size=64):
+    """Attach a normalized title+abstract `embedding` to each paper, encoding them in batches"""
+    if not papers:
+        return papers
+    embedder = get_embedder(settings.EMBEDDING_MODEL)
+    texts = [(p.get("title") or "") + "\n" + (p.get("abstract") or "") for p in papers]
+    with encode_context(embedder):
+        embs = embedder.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                               normalize_embeddings=True, show_progress_bar=False)
+    for paper, emb in zip(papers, embs):
+        paper["embedding"] = emb.astype("float32").tolist()
+    return papers
+
+def iter_arxiv_papers(query="BERT", max_results=100):
+    """Yield papers as arXiv result pages arrive, without holding the whole result set"""
+    client = arxiv.Client(page_size=min(max_results, ARXIV_PAGE_SIZE))
     search = arxiv.Search(
         query=query,
         max_results=max_results,
         sort_by=arxiv.SortCriterion.Relevance
     )
-    papers = []
     for result in client.results(search):
-        paper = {
+        # arXiv does not provide keywords, so tag papers once here rather than at request time
+        keywords = auto_tag(result.title, result.summary)
+        yield {
             "id": result.get_short_id(),
             "title": result.title,
             "abstract": result.summary,
             "authors": [{"name": author.name} for author in result.authors],
-            "published": result.published.strftime("%Y-%m-%d"),
+            "published": result.published.date().isoformat(),
             "url": result.entry_id,
-            "keywords": [],  # arXiv does not provide keywords
+            "keywords": keywords,
+            "suggest": suggest_field(result.title, keywords),
         }
-        papers.append(paper)
-    return papers
 
-def index_papers_to_elasticsearch(papers):
+def fetch_arxiv_papers(query="BERT", max_results=100):
+    return list(iter_arxiv_papers(query, max_results))
+
+async def index_papers_to_elasticsearch(papers):
+    """Index an iterable of papers chunk by chunk: embed a chunk, bulk it, then pull the next.
+
+    Accepts a generator such as iter_arxiv_papers(), so memory stays bounded by one chunk.
+    """
     # Ensure index exists
-    if not es.indices.exists(index=INDEX_NAME):
-        es.indices.create(index=INDEX_NAME)
+    if not await async_es.indices.exists(index=INDEX_NAME):
+        await async_es.indices.create(index=INDEX_NAME, mappings=INDEX_MAPPINGS)
+    papers = iter(papers)
     count = 0
-    for paper in papers:
-        es.index(index=INDEX_NAME, id=paper["id"], body=paper)
-        print(f"Indexed paper: {paper['title']}")
-        count += 1
+    while True:
+        # Pulling from a fetch generator blocks on the network and encoding is CPU/GPU-bound,
+        # so both stay off the event loop
+        chunk = await asyncio.to_thread(lambda: add_embeddings(list(islice(papers, BULK_CHUNK_SIZE))))
+        if not chunk:
+            break
+        actions = [{"_index": INDEX_NAME, "_id": paper["id"], "_source": paper} for paper in chunk]
+        indexed, _ = await async_bulk(async_es, actions, chunk_size=BULK_CHUNK_SIZE, request_timeout=60)
+        count += indexed
     print(f"Indexed {count} papers to Elasticsearch.")
 
+async def _main():
+    papers = iter_arxiv_papers()
+    try:
+        await index_papers_to_elasticsearch(papers)
+    finally:
+        await async_es.close()
+
 if __name__ == "__main__":
-    papers = fetch_arxiv_papers()
-    index_papers_to_elasticsearch(papers)
+    asyncio.run(_main())
@@ -0,0 +1,69 @@
+"""Micro-batching of concurrent model calls.
+
+Endpoints submit single items; a background task drains the queue and runs the
+wrapped batch function once per group of items that arrive within a short window,
+so concurrent requests share one forward pass instead of running N of them.
+"""
+from typing import Any, Callable, List, Optional, Sequence
+import asyncio
+
+
+class MicroBatcher:
+    """Coalesce concurrently submitted items into calls of `fn(items) -> results`.
+
+    `fn` is blocking (model inference) and runs in a worker thread so the event
+    loop stays free. Results are matched to items by position.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 10.0):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        self._ensure_worker()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        return await fut
+
+    async def submit_many(self, items: Sequence[Any]) -> List[Any]:
+        """Queue several items; they may be batched together with other callers' items."""
+        return list(await asyncio.gather(*[self.submit(item) for item in items]))
+
+    def _ensure_worker(self) -> None:
+        # Queue and task are bound to the running loop, so create them lazily
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = list(await asyncio.to_thread(self.fn, [item for item, _ in batch]))
+                if len(results) != len(batch):
+                    # Results are matched by position, so a short or long list can't be trusted
+                    raise RuntimeError(f"batch function returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
@@ -0,0 +1,75 @@
+"""Small in-process caches shared by the services."""
+from collections import OrderedDict
+from typing import Any, Hashable
+import hashlib
+import threading
+import time
+
+
+def content_key(*parts: Any) -> str:
+    """Return a sha256 hex digest identifying the given parts (order-sensitive)."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry first.
+
+    Safe to share between threads (e.g. calls offloaded with asyncio.to_thread).
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries also expire `ttl` seconds after they were stored."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = super().get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._data.pop(key, None)
+            return default
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        super().put(key, (time.monotonic() + self.ttl, value))
+
+
+_MISSING = object()
@@ -1,265 +1,227 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple
+from operator import itemgetter
 import re
 from datetime import datetime
 
+
+class CitationFields(NamedTuple):
+    """Paper fields shared by every citation style"""
+    author_names: Tuple[str, ...]
+    title: str
+    year: str
+    journal: str
+    volume: str
+    issue: str
+    pages: str
+    doi: str
+    publisher: str
+
+
+_CITATION_KEYS = ("authors", "title", "publication_date", "journal", "volume", "issue", "pages", "doi", "publisher")
+# Missing keys read as empty, like paper.get(key, "")
+_EMPTY_FIELDS = {**dict.fromkeys(_CITATION_KEYS, ""), "authors": ()}
+_get_citation_fields = itemgetter(*_CITATION_KEYS)
+
+
+def _extract_fields(paper: Dict[str, Any]) -> CitationFields:
+    """Pull the citation fields out of a paper dict in one lookup, parsing the year from publication_date"""
+    authors, title, publication_date, journal, volume, issue, pages, doi, publisher = \
+        _get_citation_fields({**_EMPTY_FIELDS, **paper})
+    return CitationFields(
+        tuple(author.get('name', '') for author in authors or ()),
+        title,
+        publication_date.split("-")[0] if publication_date else "",
+        journal, volume, issue, pages, doi, publisher,
+    )
+
+
+def _last_first(name: str) -> str:
+    """Return "Last, First Middle" for a multi-word name, or the name unchanged"""
+    name_parts = name.split()
+    if len(name_parts) > 1:
+        return f"{name_parts[-1]}, {' '.join(name_parts[:-1])}"
+    return name
+
+
 class CitationService:
     """Service for generating citations in different formats"""
-    
+
     def format_apa(self, paper: Dict[str, Any]) -> str:
         """Format citation in APA style"""
-        # Extract paper details
-        authors = paper.get("authors", [])
-        title = paper.get("title", "")
-        year = paper.get("publication_date", "").split("-")[0] if paper.get("publication_date") else ""
-        journal = paper.get("journal", "")
-        volume = paper.get("volume", "")
-        issue = paper.get("issue", "")
-        pages = paper.get("pages", "")
-        doi = paper.get("doi", "")
-        
+        names, title, year, journal, volume, issue, pages, doi, _ = _extract_fields(paper)
+
         # Format authors
         author_str = ""
-        if authors:
-            if len(authors) == 1:
-                author_str = f"{authors[0].get('name', '')}"
-            elif len(authors) == 2:
-                author_str = f"{authors[0].get('name', '')} & {authors[1].get('name', '')}"
+        if names:
+            if len(names) == 1:
+                author_str = names[0]
+            elif len(names) == 2:
+                author_str = f"{names[0]} & {names[1]}"
             else:
-                author_str = f"{authors[0].get('name', '')}, et al."
-        
-        # Build citation
-        citation = f"{author_str} ({year}). {title}. "
-        
+                author_str = f"{names[0]}, et al."
+
+        # Build citation from fragments, joined once at the end
+        parts = [f"{author_str} ({year}). {title}. "]
+
         if journal:
-            citation += f"{journal}"
-            
+            parts.append(journal)
+
             if volume:
-                citation += f", {volume}"
-                
+                parts.append(f", {volume}")
+
                 if issue:
-                    citation += f"({issue})"
-            
+                    parts.append(f"({issue})")
+
             if pages:
-                citation += f", {pages}"
-        
-        citation += "."
-        
+                parts.append(f", {pages}")
+
+        parts.append(".")
+
         if doi:
-            citation += f" https://doi.org/{doi}"
-        
-        return citation
-    
+            parts.append(f" https://doi.org/{doi}")
+
+        return "".join(parts)
+
     def format_mla(self, paper: Dict[str, Any]) -> str:
         """Format citation in MLA style"""
-        # Extract paper details
-        authors = paper.get("authors", [])
-        title = paper.get("title", "")
-        year = paper.get("publication_date", "").split("-")[0] if paper.get("publication_date") else ""
-        journal = paper.get("journal", "")
-        volume = paper.get("volume", "")
-        issue = paper.get("issue", "")
-        pages = paper.get("pages", "")
-        doi = paper.get("doi", "")
-        
+        names, title, year, journal, volume, issue, pages, doi, _ = _extract_fields(paper)
+
         # Format authors
         author_str = ""
-        if authors:
-            if len(authors) == 1:
-                name_parts = authors[0].get('name', '').split()
-                if len(name_parts) > 1:
-                    last_name = name_parts[-1]
-                    first_name = ' '.join(name_parts[:-1])
-                    author_str = f"{last_name}, {first_name}"
-                else:
-                    author_str = authors[0].get('name', '')
-            elif len(authors) == 2:
-                name_parts1 = authors[0].get('name', '').split()
-                if len(name_parts1) > 1:
-                    last_name1 = name_parts1[-1]
-                    first_name1 = ' '.join(name_parts1[:-1])
-                    author1 = f"{last_name1}, {first_name1}"
-                else:
-                    author1 = authors[0].get('name', '')
-                    
-                author_str = f"{author1} and {authors[1].get('name', '')}"
+        if names:
+            if len(names) == 1:
+                author_str = _last_first(names[0])
+            elif len(names) == 2:
+                author_str = f"{_last_first(names[0])} and {names[1]}"
             else:
-                name_parts = authors[0].get('name', '').split()
-                if len(name_parts) > 1:
-                    last_name = name_parts[-1]
-                    first_name = ' '.join(name_parts[:-1])
-                    author_str = f"{last_name}, {first_name}, et al."
-                else:
-                    author_str = f"{authors[0].get('name', '')}, et al."
-        
+                author_str = f"{_last_first(names[0])}, et al."
+
         # Build citation
-        citation = f"{author_str}. \"{title}.\" "
-        
+        parts = [f"{author_str}. \"{title}.\" "]
+
         if journal:
-            citation += f"{journal}"
-            
+            parts.append(journal)
+
             if volume:
-                citation += f", vol. {volume}"
-                
+                parts.append(f", vol. {volume}")
+
                 if issue:
-                    citation += f", no. {issue}"
-            
+                    parts.append(f", no. {issue}")
+
             if year:
-                citation += f", {year}"
-            
+                parts.append(f", {year}")
+
             if pages:
-                citation += f", pp. {pages}"
-        
-        citation += "."
-        
+                parts.append(f", pp. {pages}")
+
+        parts.append(".")
+
         if doi:
-            citation += f" DOI: {doi}"
-        
-        return citation
-    
+            parts.append(f" DOI: {doi}")
+
+        return "".join(parts)
+
     def format_chicago(self, paper: Dict[str, Any]) -> str:
         """Format citation in Chicago style"""
-        # Extract paper details
-        authors = paper.get("authors", [])
-        title = paper.get("title", "")
-        year = paper.get("publication_date", "").split("-")[0] if paper.get("publication_date") else ""
-        journal = paper.get("journal", "")
-        volume = paper.get("volume", "")
-        issue = paper.get("issue", "")
-        pages = paper.get("pages", "")
-        doi = paper.get("doi", "")
-        
+        names, title, year, journal, volume, issue, pages, doi, _ = _extract_fields(paper)
+
         # Format authors
         author_str = ""
-        if authors:
-            if len(authors) == 1:
-                name_parts = authors[0].get('name', '').split()
-                if len(name_parts) > 1:
-                    last_name = name_parts[-1]
-                    first_name = ' '.join(name_parts[:-1])
-                    author_str = f"{last_name}, {first_name}"
-                else:
-                    author_str = authors[0].get('name', '')
-            elif len(authors) <= 3:
-                authors_formatted = []
-                for i, author in enumerate(authors):
-                    name_parts = author.get('name', '').split()
-                    if len(name_parts) > 1:
-                        if i == 0:
-                            last_name = name_parts[-1]
-                            first_name = ' '.join(name_parts[:-1])
-                            authors_formatted.append(f"{last_name}, {first_name}")
-                        else:
-                            authors_formatted.append(author.get('name', ''))
-                    else:
-                        authors_formatted.append(author.get('name', ''))
-                
+        if names:
+            if len(names) == 1:
+                author_str = _last_first(names[0])
+            elif len(names) <= 3:
+                # Only the first author is inverted
+                authors_formatted = [_last_first(names[0]), *names[1:]]
                 author_str = ", ".join(authors_formatted[:-1]) + ", and " + authors_formatted[-1]
             else:
-                name_parts = authors[0].get('name', '').split()
-                if len(name_parts) > 1:
-                    last_name = name_parts[-1]
-                    first_name = ' '.join(name_parts[:-1])
-                    author_str = f"{last_name}, {first_name}, et al."
-                else:
-                    author_str = f"{authors[0].get('name', '')}, et al."
-        
+                author_str = f"{_last_first(names[0])}, et al."
+
         # Build citation
-        citation = f"{author_str}. \"{title}.\""
-        
+        parts = [f"{author_str}. \"{title}.\""]
+
         if journal:
-            citation += f" {journal}"
-            
+            parts.append(f" {journal}")
+
             if volume:
-                citation += f" {volume}"
-                
+                parts.append(f" {volume}")
+
                 if issue:
-                    citation += f", no. {issue}"
-            
+                    parts.append(f", no. {issue}")
+
             if year:
-                citation += f" ({year})"
-            
+                parts.append(f" ({year})")
+
             if pages:
-                citation += f": {pages}"
-        
-        citation += "."
-        
+                parts.append(f": {pages}")
+
+        parts.append(".")
+
         if doi:
-            citation += f" https://doi.org/{doi}"
-        
-        return citation
-    
+            parts.append(f" https://doi.org/{doi}")
+
+        return "".join(parts)
+
     def format_bibtex(self, paper: Dict[str, Any]) -> str:
         """Format citation in BibTeX format"""
-        # Extract paper details
-        authors = paper.get("authors", [])
-        title = paper.get("title", "")
-        year = paper.get("publication_date", "").split("-")[0] if paper.get("publication_date") else ""
-        journal = paper.get("journal", "")
-        volume = paper.get("volume", "")
-        issue = paper.get("issue", "")
-        pages = paper.get("pages", "")
-        doi = paper.get("doi", "")
-        publisher = paper.get("publisher", "")
-        
+        names, title, year, journal, volume, issue, pages, doi, publisher = _extract_fields(paper)
+
         # Generate citation key
         citation_key = ""
-        if authors and year:
-            first_author_last_name = authors[0].get('name', '').split()[-1]
+        if names and year:
+            first_author_last_name = names[0].split()[-1]
             citation_key = f"{first_author_last_name.lower()}{year}"
         else:
             citation_key = f"paper{paper.get('id', '')}"
-        
+
         # Format authors for BibTeX
-        author_str = " and ".join([author.get('name', '') for author in authors])
-        
-        # Build BibTeX entry
-        bibtex = f"@article{{{citation_key},\n"
-        bibtex += f"  author = {{{author_str}}},\n"
-        bibtex += f"  title = {{{title}}},\n"
-        
+        author_str = " and ".join(names)
+
+        # Collect the field lines, then join them with ",\n" so the last one has no trailing comma
+        fields = [
+            f"  author = {{{author_str}}}",
+            f"  title = {{{title}}}",
+        ]
+
         if journal:
-            bibtex += f"  journal = {{{journal}}},\n"
-        
+            fields.append(f"  journal = {{{journal}}}")
+
         if year:
-            bibtex += f"  year = {{{year}}},\n"
-        
+            fields.append(f"  year = {{{year}}}")
+
         if volume:
-            bibtex += f"  volume = {{{volume}}},\n"
-        
+            fields.append(f"  volume = {{{volume}}}")
+
         if issue:
-            bibtex += f"  number = {{{issue}}},\n"
-        
+            fields.append(f"  number = {{{issue}}}")
+
         if pages:
-            bibtex += f"  pages = {{{pages}}},\n"
-        
+            fields.append(f"  pages = {{{pages}}}")
+
         if publisher:
-            bibtex += f"  publisher = {{{publisher}}},\n"
-        
+            fields.append(f"  publisher = {{{publisher}}}")
+
         if doi:
-            bibtex += f"  doi = {{{doi}}},\n"
-            bibtex += f"  url = {{https://doi.org/{doi}}},\n"
-        
-        # Remove trailing comma from last entry
-        bibtex = bibtex.rstrip(",\n") + "\n"
-        bibtex += "}"
-        
-        return bibtex
-    
+            fields.append(f"  doi = {{{doi}}}")
+            fields.append(f"  url = {{https://doi.org/{doi}}}")
+
+        return f"@article{{{citation_key},\n" + ",\n".join(fields) + "\n}"
+
+    def _formatter(self, style: str):
+        """Return the bound format method for a style name (APA by default)"""
+        return {
+            "apa": self.format_apa,
+            "mla": self.format_mla,
+            "chicago": self.format_chicago,
+            "bibtex": self.format_bibtex,
+        }.get(style.lower(), self.format_apa)
+
     def format_citation(self, paper: Dict[str, Any], style: str = "apa") -> str:
         """Format citation in the specified style"""
-        style = style.lower()
-        
-        if style == "apa":
-            return self.format_apa(paper)
-        elif style == "mla":
-            return self.format_mla(paper)
-        elif style == "chicago":
-            return self.format_chicago(paper)
-        elif style == "bibtex":
-            return self.format_bibtex(paper)
-        else:
-            return self.format_apa(paper)  # Default to APA
-    
+        return self._formatter(style)(paper)
+
     def format_multiple_citations(self, papers: List[Dict[str, Any]], style: str = "apa") -> List[str]:
         """Format multiple citations in the specified style"""
-        return [self.format_citation(paper, style) for paper in papers]
\ No newline at end of file
+        # Resolve the style once rather than per paper
+        formatter = self._formatter(style)
+        return [formatter(paper) for paper in papers]
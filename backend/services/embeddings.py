@@ -0,0 +1,100 @@
+"""Device and precision placement for sentence-transformer embedding models."""
+from contextlib import ExitStack
+from functools import lru_cache
+from typing import ContextManager, List
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from app.core.config import settings
+from app.services.cache import LRUCache, content_key
+
+
+def embedding_device() -> str:
+    """Device embedding models run on: the GPU when one is available."""
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def embedding_dtype(device: str) -> str:
+    """Resolve settings.EMBEDDING_DTYPE; 'auto' means float16 on GPU and float32 on CPU."""
+    dtype = settings.EMBEDDING_DTYPE.lower()
+    if dtype == 'auto':
+        return 'float16' if device == 'cuda' else 'float32'
+    return dtype
+
+
+def load_embedder(model_name: str = settings.EMBEDDING_MODEL) -> SentenceTransformer:
+    """Load a SentenceTransformer on the embedding device, cast to half precision on GPU when configured."""
+    device = embedding_device()
+    model = SentenceTransformer(model_name, device=device)
+    dtype = embedding_dtype(device)
+    if device == 'cuda' and dtype in ('float16', 'bfloat16'):
+        model.to(getattr(torch, dtype))
+    return model
+
+
+@lru_cache(maxsize=None)
+def get_embedder(model_name: str = settings.EMBEDDING_MODEL) -> SentenceTransformer:
+    """Return the process-wide embedder for a model name, loading it on first use.
+
+    Services share this instance instead of each holding its own copy of the weights.
+    """
+    return load_embedder(model_name)
+
+
+def encode_context(model: SentenceTransformer) -> ContextManager:
+    """Context to wrap encode() calls in: inference mode, plus BF16 autocast for CPU models when configured.
+
+    Inference mode skips autograd bookkeeping (version counters, view tracking) that no_grad
+    still pays for. CPU weights stay in float32 and only the matmuls run in bfloat16, which pays
+    off on CPUs with native BF16 support (AMX / AVX512-BF16); GPU models are already cast to
+    half precision by load_embedder.
+    """
+    stack = ExitStack()
+    stack.enter_context(torch.inference_mode())
+    if model.device.type == 'cpu' and embedding_dtype('cpu') == 'bfloat16':
+        stack.enter_context(torch.autocast(device_type='cpu', dtype=torch.bfloat16))
+    return stack
+
+
+# Max number of embeddings a service keeps in its encode_cached LRU cache
+EMBEDDING_CACHE_SIZE = 10_000
+
+
+def encode_cached(model: SentenceTransformer, texts: List[str], cache: LRUCache,
+                  batch_size: int = 32) -> np.ndarray:
+    """Normalized float32 embeddings (N, D) for texts, encoding only those missing from `cache`.
+
+    The cache maps sha256(text) -> embedding row; each new row is stored as its own copy so a
+    cached entry doesn't keep the whole encoded batch alive.
+    """
+    keys = [content_key(t) for t in texts]
+    found = {k: cache.get(k) for k in keys}
+    missing = [k for k, e in found.items() if e is None]
+    if missing:
+        text_by_key = dict(zip(keys, texts))
+        with encode_context(model):
+            embs = model.encode(
+                [text_by_key[k] for k in missing],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        for k, e in zip(missing, np.asarray(embs, dtype=np.float32)):
+            found[k] = e.copy()
+            cache.put(k, found[k])
+    return np.ascontiguousarray(np.stack([found[k] for k in keys]), dtype=np.float32)
+
+
+def cosine_similarity_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise cosine similarities between the rows of `a` (N, D) and `b` (M, D) as an (N, M) float32 array.
+
+    Rows are normalized once and the scores come from a single BLAS matmul; zero rows score 0.
+    """
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    a = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-12)
+    b = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-12)
+    return a @ b.T
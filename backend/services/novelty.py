@@ -2,9 +2,9 @@ from typing import List, Dict, Any, Optional
 import numpy as np
 from math import log2
 
-from sentence_transformers import SentenceTransformer
-
-from app.services.search import SearchService
+from app.services.cache import LRUCache
+from app.services.embeddings import encode_context, get_embedder
+from app.services.search import get_search_service
 from app.core.config import settings
 
 
@@ -17,43 +17,75 @@ class NoveltyService:
     - lexical entropy of the text
     """
 
+    # Max number of candidate-paper embeddings kept between queries
+    CANDIDATE_CACHE_SIZE = 4_096
+
     def __init__(self):
         # Use the same embedding model as search to ensure compatibility
         try:
-            self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+            self.embedding_model = get_embedder(settings.EMBEDDING_MODEL)
         except Exception:
             # Fallback to a minimal model name if config missing
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.embedding_model = get_embedder('all-MiniLM-L6-v2')
 
         # Try to initialize search service (may be heavy)
         try:
-            self.search = SearchService()
+            self.search = get_search_service()
         except Exception:
             self.search = None
 
-    def _cosine(self, a: np.ndarray, b: np.ndarray) -> float:
-        if a is None or b is None: return 0.0
-        # ensure float
-        a = np.array(a, dtype=float)
-        b = np.array(b, dtype=float)
-        denom = (np.linalg.norm(a) * np.linalg.norm(b))
-        if denom == 0: return 0.0
-        return float(np.dot(a, b) / denom)
+        # paper id -> normalized embedding, so candidates seen by earlier queries skip the encoder
+        self._candidate_cache = LRUCache(self.CANDIDATE_CACHE_SIZE)
+
+    @staticmethod
+    def _candidate_cache_key(candidate: Dict[str, Any]) -> Optional[str]:
+        """Stable identifier for caching a candidate's embedding, or None when it has none
+
+        Titles are not used: different papers can share one.
+        """
+        key = candidate.get('id') or candidate.get('paper_id') or candidate.get('doi')
+        return str(key) if key else None
+
+    def _candidate_embeddings(self, candidates: List[Dict[str, Any]]) -> np.ndarray:
+        """Return normalized embeddings for the candidates, encoding uncached ones in one batch
+
+        Candidates indexed with a stored `embedding` use it directly instead of being re-encoded.
+        Only candidates with a stable id are cached.
+        """
+        dim = self.embedding_model.get_sentence_embedding_dimension()
+        keys = [self._candidate_cache_key(c) for c in candidates]
+        rows: List[Optional[np.ndarray]] = [self._candidate_cache.get(k) if k else None for k in keys]
+        missing = []
+        for i, c in enumerate(candidates):
+            if rows[i] is not None:
+                continue
+            stored = c.get('embedding')
+            if stored is not None and len(stored) == dim:
+                rows[i] = np.asarray(stored, dtype=np.float32)
+                if keys[i]:
+                    self._candidate_cache.put(keys[i], rows[i])
+            else:
+                missing.append(i)
+        if missing:
+            texts = [(candidates[i].get('title') or '') + '\n' + (candidates[i].get('abstract') or '') for i in missing]
+            with encode_context(self.embedding_model):
+                embs = self.embedding_model.encode(texts, batch_size=32, convert_to_numpy=True,
+                                                   normalize_embeddings=True, show_progress_bar=False)
+            for i, e in zip(missing, np.asarray(embs, dtype=np.float32)):
+                rows[i] = e.copy()
+                if keys[i]:
+                    self._candidate_cache.put(keys[i], rows[i])
+        return np.stack(rows)
 
     def _entropy_norm(self, text: str) -> float:
         if not text: return 0.0
-        toks = [t.lower() for t in text.split() if t.strip()]
+        toks = text.lower().split()
         if not toks: return 0.0
-        freq = {}
-        for t in toks:
-            freq[t] = freq.get(t, 0) + 1
-        total = len(toks)
-        entropy = 0.0
-        for v in freq.values():
-            p = v / total
-            entropy -= p * log2(p)
+        _, counts = np.unique(toks, return_counts=True)
+        p = counts / counts.sum()
+        entropy = -(p * np.log2(p)).sum()
         # normalize by log2(V) where V is vocabulary size (max entropy)
-        V = len(freq)
+        V = counts.size
         if V <= 1: return 0.0
         return float(entropy / log2(V))
 
@@ -61,7 +93,9 @@ class NoveltyService:
         text = (title or '') + '\n' + (abstract or '')
         # compute embedding
         try:
-            emb = self.embedding_model.encode(text)
+            with encode_context(self.embedding_model):
+                emb = self.embedding_model.encode([text], convert_to_numpy=True, normalize_embeddings=True,
+                                                  show_progress_bar=False)[0].astype(np.float32)
         except Exception:
             emb = None
 
@@ -70,41 +104,41 @@ class NoveltyService:
         try:
             if self.search:
                 q = (title or '') + ' ' + ((abstract or '')[:300])
-                candidates = self.search.hybrid_search(q, size=top_k)
+                candidates = self.search.hybrid_search(q, size=top_k, include_embeddings=True)
         except Exception:
             candidates = []
 
         # compute similarities using embeddings where possible
-        similarities = []
-        try:
-            for c in candidates:
-                c_text = (c.get('title') or '') + '\n' + (c.get('abstract') or '')
-                c_emb = None
-                try:
-                    c_emb = self.embedding_model.encode(c_text)
-                except Exception:
-                    c_emb = None
-                sim = self._cosine(emb, c_emb) if emb is not None and c_emb is not None else 0.0
-                similarities.append({'id': str(c.get('id') or c.get('paper_id') or c.get('doi') or c.get('title')), 'title': c.get('title'), 'similarity': sim})
-        except Exception:
-            similarities = []
-
-        max_similarity = max([s['similarity'] for s in similarities], default=0.0)
-        similar_count = sum(1 for s in similarities if s['similarity'] >= 0.7)
+        # (ids/titles are parallel to the sims array so the stats below stay vectorized)
+        ids = [str(c.get('id') or c.get('paper_id') or c.get('doi') or c.get('title')) for c in candidates]
+        titles = [c.get('title') for c in candidates]
+        sims = np.zeros(len(candidates), dtype=np.float32)
+        if emb is not None and candidates:
+            try:
+                # embeddings are unit length, so one matrix-vector product gives every cosine
+                sims = self._candidate_embeddings(candidates) @ emb
+            except Exception:
+                pass
+
+        max_similarity = float(sims.max()) if sims.size else 0.0
+        similar_count = int((sims >= 0.7).sum())
+
+        # top 10 most similar: O(N) partition, then sort just those
+        top_n = min(10, sims.size)
+        top_idx = np.argpartition(-sims, top_n - 1)[:top_n] if top_n else np.empty(0, dtype=int)
+        top_idx = top_idx[np.argsort(-sims[top_idx], kind='stable')]
+        similar_examples = [{'id': ids[i], 'title': titles[i], 'similarity': float(sims[i])} for i in top_idx]
 
         # citation/reference overlap
         overlap_score = 0.0
         max_overlap = 0
         if references and len(references) > 0 and candidates:
-            refs_set = set([r.strip().lower() for r in references if r and isinstance(r, str)])
-            for c in candidates:
-                c_refs = c.get('references') or c.get('citations') or []
-                cset = set([str(x).strip().lower() for x in (c_refs or []) if x])
-                if not cset:
-                    continue
-                overlap = len(refs_set & cset)
-                if overlap > max_overlap:
-                    max_overlap = overlap
+            refs_set = frozenset(r.strip().lower() for r in references if r and isinstance(r, str))
+            cand_sets = [
+                frozenset(str(x).strip().lower() for x in (c.get('references') or c.get('citations') or []) if x)
+                for c in candidates
+            ]
+            max_overlap = max((len(refs_set & cset) for cset in cand_sets if cset), default=0)
             # normalize overlap by number of references (clamp)
             overlap_score = min(1.0, max_overlap / max(1, len(references)))
 
@@ -124,8 +158,16 @@ class NoveltyService:
                 'overlap_score': round(float(overlap_score), 4),
                 'entropy_norm': round(float(entropy_norm), 4)
             },
-            'similar_examples': sorted(similarities, key=lambda x: x['similarity'], reverse=True)[:10]
+            'similar_examples': similar_examples
         }
 
 
-novelty_service = NoveltyService()
+# Lazy singleton so importing this module doesn't load the embedding model and search service
+_novelty_service_instance: Optional[NoveltyService] = None
+
+def get_novelty_service() -> NoveltyService:
+    """Return a singleton NoveltyService instance (lazy-initialized)."""
+    global _novelty_service_instance
+    if _novelty_service_instance is None:
+        _novelty_service_instance = NoveltyService()
+    return _novelty_service_instance
@@ -7,15 +7,67 @@ Note: OpenAlex rate limits apply; this is a lightweight client for best-effort
 graph augmentation when the local index doesn't contain explicit references.
 """
 from typing import List, Dict, Optional
+import asyncio
 import httpx
+import orjson
+
+from app.core.config import settings
+from app.services.cache import TTLCache
 
 BASE = "https://api.openalex.org"
+# Identify ourselves so OpenAlex can route requests to its polite pool when an email is configured
+_HEADERS = {"User-Agent": f"AutoScholar/1.0 (mailto:{settings.OPENALEX_EMAIL})" if settings.OPENALEX_EMAIL else "AutoScholar/1.0"}
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+# OpenAlex caps OR-filters (`ids.openalex:W1|W2|...`) at this many values per request
+_MAX_IDS_PER_FILTER = 50
+# Largest page OpenAlex serves; bigger requests are paged with a cursor
+_MAX_PER_PAGE = 200
+# Fields the citation graph reads from citing works; `select` drops the rest of each work object
+_CITING_WORK_FIELDS = "id,doi,title,display_name,publication_year,authorships,ids,cited_by_count"
+
+# Shared sync client: keeps TCP/TLS connections alive across calls instead of a handshake per request
+_CLIENT = httpx.Client(http2=True, headers=_HEADERS, limits=_LIMITS, timeout=20.0)
+
+# Works change rarely; memoize successful lookups for an hour.
+# Keyed on the normalized works URL, so DOI case and OpenAlex id forms share an entry
+_work_cache = TTLCache(maxsize=4096, ttl=3600)
+# (openalex_id, per_page) -> citing works
+_citing_cache = TTLCache(maxsize=1024, ttl=3600)
 
 
 def _normalize_doi(doi: str) -> str:
     return doi.strip().lower()
 
 
+def abstract_from_inverted_index(inverted_index: Optional[Dict[str, List[int]]]) -> str:
+    """Rebuild abstract text from OpenAlex's `abstract_inverted_index` (word -> positions)."""
+    if not inverted_index:
+        return ''
+    positions = [(pos, word) for word, poss in inverted_index.items() for pos in (poss or [])]
+    return ' '.join(word for _, word in sorted(positions))
+
+
+def _short_id(openalex_id: str) -> str:
+    """'https://openalex.org/W123' -> 'W123' (bare ids are returned unchanged)."""
+    return openalex_id.rsplit('/', 1)[-1]
+
+
+def _work_url(identifier: str) -> str:
+    """Build the OpenAlex works URL for a DOI or OpenAlex id."""
+    identifier = identifier.strip()
+    # if looks like DOI (contains a slash and a dot)
+    if '/' in identifier and '.' in identifier and not identifier.lower().startswith('https://openalex.org'):
+        doi = _normalize_doi(identifier)
+        return f"{BASE}/works/doi:{doi}"
+    # assume it's an OpenAlex id or path
+    if identifier.startswith('http'):
+        # extract path after domain
+        parts = identifier.split('openalex.org/')
+        if len(parts) > 1:
+            identifier = parts[1]
+    return f"{BASE}/works/{identifier}"
+
+
 def resolve_work(identifier: str) -> Optional[Dict]:
     """Resolve an identifier (DOI or OpenAlex id) to an OpenAlex work object.
 
@@ -24,30 +76,56 @@ def resolve_work(identifier: str) -> Optional[Dict]:
     """
     if not identifier:
         return None
-    identifier = identifier.strip()
-    # if looks like DOI (contains a slash and a dot)
+    url = _work_url(identifier)
+    cached = _work_cache.get(url)
+    if cached is not None:
+        return cached
     try:
-        if '/' in identifier and '.' in identifier and not identifier.lower().startswith('https://openalex.org'):
-            doi = _normalize_doi(identifier)
-            url = f"{BASE}/works/doi:{doi}"
-        else:
-            # assume it's an OpenAlex id or path
-            if identifier.startswith('http'):
-                # extract path after domain
-                parts = identifier.split('openalex.org/')
-                if len(parts) > 1:
-                    identifier = parts[1]
-            url = f"{BASE}/works/{identifier}"
-
-        with httpx.Client(timeout=20.0) as client:
-            r = client.get(url)
-            if r.status_code == 200:
-                return r.json()
+        r = _CLIENT.get(url)
+        if r.status_code == 200:
+            work = orjson.loads(r.content)
+            _work_cache.put(url, work)
+            return work
     except Exception:
         return None
     return None
 
 
+async def resolve_works_async(identifiers: List[str], concurrency: int = 16) -> List[Optional[Dict]]:
+    """Resolve many identifiers concurrently; results are aligned with `identifiers`.
+
+    A semaphore caps in-flight requests so large batches don't hammer OpenAlex.
+    Failed or unknown identifiers resolve to None.
+    """
+    if not identifiers:
+        return []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _fetch(client: httpx.AsyncClient, url: str) -> Optional[Dict]:
+        try:
+            async with sem:
+                r = await client.get(url)
+            if r.status_code == 200:
+                work = orjson.loads(r.content)
+                _work_cache.put(url, work)
+                return work
+        except Exception:
+            return None
+        return None
+
+    urls = [_work_url(i) if i else None for i in identifiers]
+    results: List[Optional[Dict]] = [_work_cache.get(u) if u else None for u in urls]
+    # Only go to the network for identifiers that aren't cached (each distinct URL once)
+    missing = list(dict.fromkeys(u for u, r in zip(urls, results) if u and r is None))
+    if not missing:
+        return results
+
+    # One client per batch (event loops differ between callers); HTTP/2 multiplexes the batch over few connections
+    async with httpx.AsyncClient(http2=True, headers=_HEADERS, limits=_LIMITS, timeout=20.0) as client:
+        fetched = dict(zip(missing, await asyncio.gather(*[_fetch(client, u) for u in missing])))
+    return [r if r is not None else fetched.get(u) for u, r in zip(urls, results)]
+
+
 def get_citing_works(openalex_id: str, per_page: int = 50) -> List[Dict]:
     """Return works that cite the given OpenAlex work id.
 
@@ -60,36 +138,115 @@ def get_citing_works(openalex_id: str, per_page: int = 50) -> List[Dict]:
         parts = openalex_id.split('openalex.org/')
         openalex_id = parts[1] if len(parts) > 1 else openalex_id
 
+    cached = _citing_cache.get((openalex_id, per_page))
+    if cached is not None:
+        return cached
+
     url = f"{BASE}/works"
-    params = {"filter": f"referenced_works:{openalex_id}", "per_page": per_page}
+    params = {
+        "filter": f"referenced_works:{openalex_id}",
+        "per_page": min(per_page, _MAX_PER_PAGE),
+        "select": _CITING_WORK_FIELDS,
+        "cursor": "*",
+    }
+    results: List[Dict] = []
     try:
-        with httpx.Client(timeout=20.0) as client:
-            r = client.get(url, params=params)
-            if r.status_code == 200:
-                data = r.json()
-                return data.get('results', [])
+        # Follow meta.next_cursor until per_page works are collected or the results run out
+        while len(results) < per_page and params["cursor"]:
+            r = _CLIENT.get(url, params=params)
+            if r.status_code != 200:
+                return []
+            data = orjson.loads(r.content)
+            page = data.get('results', [])
+            if not page:
+                break
+            results.extend(page)
+            params["cursor"] = (data.get('meta') or {}).get('next_cursor')
     except Exception:
         return []
-    return []
+    results = results[:per_page]
+    _citing_cache.put((openalex_id, per_page), results)
+    return results
 
 
-def get_referenced_works(openalex_id: str, per_page: int = 50) -> List[Dict]:
+async def fetch_works_by_ids_async(openalex_ids: List[str], concurrency: int = 8) -> List[Optional[Dict]]:
+    """Fetch many OpenAlex works by id with batched `ids.openalex` filter queries.
+
+    One request covers up to _MAX_IDS_PER_FILTER ids instead of one GET per work; batches run
+    concurrently, at most `concurrency` at a time. Results are aligned with `openalex_ids`
+    (None for ids OpenAlex doesn't return) and share the resolve_work cache.
+    """
+    if not openalex_ids:
+        return []
+    urls = [_work_url(i) for i in openalex_ids]
+    results: List[Optional[Dict]] = [_work_cache.get(u) for u in urls]
+    missing = list(dict.fromkeys(_short_id(i) for i, r in zip(openalex_ids, results) if r is None))
+    if not missing:
+        return results
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _fetch_batch(client: httpx.AsyncClient, ids: List[str]) -> List[Dict]:
+        params = {"filter": f"ids.openalex:{'|'.join(ids)}", "per_page": len(ids)}
+        try:
+            async with sem:
+                r = await client.get(f"{BASE}/works", params=params)
+            if r.status_code == 200:
+                return orjson.loads(r.content).get('results', [])
+        except Exception:
+            return []
+        return []
+
+    batches = [missing[i:i + _MAX_IDS_PER_FILTER] for i in range(0, len(missing), _MAX_IDS_PER_FILTER)]
+    async with httpx.AsyncClient(http2=True, headers=_HEADERS, limits=_LIMITS, timeout=20.0) as client:
+        pages = await asyncio.gather(*[_fetch_batch(client, b) for b in batches])
+    # Filter results come back in OpenAlex's order, so match them up by id
+    fetched: Dict[str, Dict] = {}
+    for work in (w for page in pages for w in page):
+        url = _work_url(_short_id(work.get('id') or ''))
+        fetched[url] = work
+        _work_cache.put(url, work)
+    return [r if r is not None else fetched.get(u) for u, r in zip(urls, results)]
+
+
+async def get_referenced_works_async(openalex_id: str, per_page: int = 50, concurrency: int = 8) -> List[Dict]:
     """Return works referenced by the given OpenAlex work id (the references list).
 
-    The OpenAlex work object contains 'referenced_works' (list of ids). This fetches the first `per_page` of them.
+    The OpenAlex work object contains 'referenced_works' (list of ids). The first `per_page` of them
+    are fetched with batched id-filter queries (see fetch_works_by_ids_async) rather than one GET each.
+    """
+    works = await resolve_works_async([openalex_id])
+    w = works[0] if works else None
+    if not w:
+        return []
+    refs = (w.get('referenced_works') or [])[:per_page]
+    results = await fetch_works_by_ids_async(refs, concurrency=concurrency)
+    return [r for r in results if r]
+
+
+def get_referenced_works(openalex_id: str, per_page: int = 50) -> List[Dict]:
+    """Sync counterpart of get_referenced_works_async, on the shared sync client.
+
+    Uses the same batched id-filter queries, run one after another; safe to call from a running event loop.
     """
     w = resolve_work(openalex_id)
     if not w:
         return []
-    refs = w.get('referenced_works') or []
-    refs = refs[:per_page]
-    results = []
-    try:
-        with httpx.Client(timeout=20.0) as client:
-            for rid in refs:
-                r = client.get(f"{BASE}/works/{rid}")
-                if r.status_code == 200:
-                    results.append(r.json())
-    except Exception:
-        return results
-    return results
+    urls = [_work_url(i) for i in (w.get('referenced_works') or [])[:per_page]]
+    results: List[Optional[Dict]] = [_work_cache.get(u) for u in urls]
+    missing = list(dict.fromkeys(_short_id(u) for u, r in zip(urls, results) if r is None))
+    fetched: Dict[str, Dict] = {}
+    for start in range(0, len(missing), _MAX_IDS_PER_FILTER):
+        ids = missing[start:start + _MAX_IDS_PER_FILTER]
+        params = {"filter": f"ids.openalex:{'|'.join(ids)}", "per_page": len(ids)}
+        try:
+            r = _CLIENT.get(f"{BASE}/works", params=params)
+            if r.status_code != 200:
+                continue
+            for work in orjson.loads(r.content).get('results', []):
+                url = _work_url(_short_id(work.get('id') or ''))
+                fetched[url] = work
+                _work_cache.put(url, work)
+        except Exception:
+            continue
+    results = [r if r is not None else fetched.get(u) for u, r in zip(urls, results)]
+    return [r for r in results if r]
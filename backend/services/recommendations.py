@@ -1,16 +1,18 @@
 from typing import List, Dict, Any, Optional
+from collections import deque
+from itertools import chain
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 
 from app.core.config import settings
-from app.services.search import SearchService
+from app.services.search import get_search_service
 
 class RecommendationService:
     """Service for generating personalized paper recommendations"""
     
     def __init__(self):
-        # Initialize search service for embeddings
-        self.search_service = SearchService()
+        # Shared search service, so its model and FAISS index are not loaded a second time
+        self.search_service = get_search_service()
     
     def get_content_based_recommendations(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -54,12 +56,19 @@ class RecommendationService:
         content_recs = self.get_content_based_recommendations(user_id, limit=limit)
         collab_recs = self.get_collaborative_recommendations(user_id, limit=limit)
         
-        # Combine and deduplicate
-        all_recs = content_recs + collab_recs
-        unique_recs = {rec.get("id"): rec for rec in all_recs if rec.get("id")}
+        # Combine and deduplicate in one pass, stopping once there are enough
+        unique_recs = []
+        seen_ids = set()
+        for rec in chain(content_recs, collab_recs):
+            if len(unique_recs) >= limit:
+                break
+            rec_id = rec.get("id")
+            if rec_id and rec_id not in seen_ids:
+                seen_ids.add(rec_id)
+                unique_recs.append(rec)
         
         # Return top recommendations
-        return list(unique_recs.values())[:limit]
+        return unique_recs
     
     def get_trending_papers(self, topic: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -82,26 +91,33 @@ class RecommendationService:
         if not recommendations:
             return []
         
-        # Group papers by topic
-        topic_groups = {}
+        # Group papers by topic (deques, so taking the head of a group is O(1))
+        topic_groups: Dict[Any, deque] = {}
         for paper in recommendations:
             topics = paper.get("topics", [])
             for topic in topics:
-                if topic not in topic_groups:
-                    topic_groups[topic] = []
-                topic_groups[topic].append(paper)
+                topic_groups.setdefault(topic, deque()).append(paper)
         
-        # Select papers from different topics
+        # Select papers from different topics, one per topic per round
         diverse_recs = []
-        topics = list(topic_groups.keys())
+        groups = list(topic_groups.values())
         
-        while len(diverse_recs) < limit and topics:
-            for topic in topics[:]:
-                if topic_groups[topic]:
-                    diverse_recs.append(topic_groups[topic].pop(0))
-                    if len(diverse_recs) >= limit:
-                        break
-                else:
-                    topics.remove(topic)
+        while len(diverse_recs) < limit and groups:
+            for group in groups:
+                diverse_recs.append(group.popleft())
+                if len(diverse_recs) >= limit:
+                    return diverse_recs
+            # Drop exhausted topics once per round instead of list.remove in the loop
+            groups = [group for group in groups if group]
         
-        return diverse_recs[:limit]
\ No newline at end of file
+        return diverse_recs
+
+# Lazy singleton so the underlying SearchService is only built on first use
+_recommendation_service_instance: Optional[RecommendationService] = None
+
+def get_recommendation_service() -> RecommendationService:
+    """Return a singleton RecommendationService instance (lazy-initialized)."""
+    global _recommendation_service_instance
+    if _recommendation_service_instance is None:
+        _recommendation_service_instance = RecommendationService()
+    return _recommendation_service_instance
@@ -1,74 +1,154 @@
 from typing import List, Dict, Any, Optional
+import logging
 import numpy as np
-from elasticsearch import Elasticsearch
+from elasticsearch import ApiError
 import faiss
-from sentence_transformers import SentenceTransformer
 
 from app.core.config import settings
+from app.services.arxiv_ingest import es
+from app.services.cache import LRUCache
+from app.services.embeddings import (
+    EMBEDDING_CACHE_SIZE, cosine_similarity_matrix, encode_cached, get_embedder
+)
 from app.models.paper import Paper
 
+logger = logging.getLogger("autoscolar.search")
+
 class SearchService:
     """Service for hybrid search functionality combining BM25 and vector search"""
+
+    # HNSW graph parameters: neighbours per node, build-time and query-time candidate list sizes.
+    # Higher efSearch trades latency for recall.
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 200
+    HNSW_EF_SEARCH = 64
+
+    # Fields a result list needs (what the paper cards render); everything else, notably the
+    # abstract-sized `embedding` vector, stays on the ES side
+    LIST_SOURCE_FIELDS = [
+        "id", "paper_id", "title", "authors", "abstract", "published", "doi", "url",
+        "journal", "keywords", "topics", "citation_count", "ai_summary"
+    ]
+    # With include_embeddings: the list fields plus what reranking and novelty scoring read
+    EMBEDDING_SOURCE_FIELDS = LIST_SOURCE_FIELDS + ["embedding", "references", "citations"]
+    # Queries with at least this many words are matched as one blended field with every term required
+    CROSS_FIELDS_MIN_WORDS = 3
+    # SearchFilters list fields -> the keyword field each one matches exactly
+    # (authors are indexed as [{"name": ...}] objects; topics are the ingest-time keyword tags)
+    TERMS_FILTER_FIELDS = {
+        "authors": "authors.name.keyword",
+        "journals": "journal.keyword",
+        "topics": "keywords.keyword",
+    }
+    # Server-side reciprocal rank fusion: rank constant and kNN candidates per requested hit
+    RRF_RANK_CONSTANT = 20
+    KNN_CANDIDATES_FACTOR = 5
     
     def __init__(self):
-        # Initialize Elasticsearch client with HTTPS and authentication
-        self.es = Elasticsearch(
-            hosts=[{
-                'host': settings.ELASTICSEARCH_HOST,
-                'port': settings.ELASTICSEARCH_PORT,
-                'scheme': 'https'
-            }],
-            basic_auth=("elastic", "BnKf5CZd4MIVY=Cg-MQ0"),  # <-- Replace <your-password> with your actual password
-            verify_certs=False  # For local dev, disables SSL verification
-        )
+        # Process-wide Elasticsearch client (HTTPS with authentication) shared with ingestion and the API
+        self.es = es
         
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        # Initialize embedding model (cached per model name, so every service shares one copy)
+        self.embedding_model = get_embedder(settings.EMBEDDING_MODEL)
+        # sha256(text) -> embedding, so repeated queries skip the encoder
+        self._embedding_cache = LRUCache(EMBEDDING_CACHE_SIZE)
         
-        # Initialize FAISS index
+        # Initialize FAISS index: approximate HNSW graph instead of a linear scan over every vector.
+        # Inner product on normalized vectors == cosine similarity
         self.dimension = settings.VECTOR_DIMENSION
-        self.index = faiss.IndexFlatIP(self.dimension)  # Inner product similarity
+        hnsw = faiss.IndexHNSWFlat(self.dimension, self.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+        hnsw.hnsw.efSearch = self.HNSW_EF_SEARCH
+        # HNSW can't store ids itself; the IDMap2 wrapper maps FAISS rows back to paper ids
+        self.index = faiss.IndexIDMap2(hnsw)
+
+        # Cleared once the cluster rejects the RRF retriever itself (pre-8.14 or unlicensed);
+        # other errors only send that one request through the Python fusion
+        self._server_rrf = True
     
     def get_embedding(self, text: str) -> np.ndarray:
         """Generate embedding vector for text"""
-        return self.embedding_model.encode(text)
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embed several texts in padded batches as a contiguous (N, D) float32 array of unit-length rows.
+
+        Normalized rows make inner product an exact cosine similarity, and float32 is what FAISS
+        consumes without a copy (half-precision models would otherwise return float16).
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return encode_cached(self.embedding_model, texts, self._embedding_cache, batch_size=batch_size)
+    
+    @classmethod
+    def _filter_clauses(cls, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """ES filter clauses for the set SearchFilters fields (unset fields are skipped)
+
+        List filters become exact `terms` matches on the indexed keyword subfield, and
+        year_from/year_to become one range over the `published` date, whole years inclusive.
+        """
+        filters = filters or {}
+        clauses = []
+        for name, field in cls.TERMS_FILTER_FIELDS.items():
+            value = filters.get(name)
+            if value:
+                clauses.append({"terms": {field: value if isinstance(value, list) else [value]}})
+        year_range = {}
+        if filters.get("year_from") is not None:
+            year_range["gte"] = f"{filters['year_from']}||/y"
+        if filters.get("year_to") is not None:
+            # /y rounds lte up to the last millisecond of the year
+            year_range["lte"] = f"{filters['year_to']}||/y"
+        if year_range:
+            clauses.append({"range": {"published": year_range}})
+        return clauses
+
+    def _source_fields(self, include_embeddings: bool) -> List[str]:
+        return self.EMBEDDING_SOURCE_FIELDS if include_embeddings else self.LIST_SOURCE_FIELDS
+
+    def _bm25_query(self, query: str, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """The BM25 bool query shared by keyword_search and the server-side hybrid search"""
+        if len(query.split()) >= self.CROSS_FIELDS_MIN_WORDS:
+            # Longer queries: score terms across fields as one, requiring all of them
+            # (cross_fields does not support fuzziness)
+            multi_match = {"type": "cross_fields", "operator": "and"}
+        else:
+            multi_match = {"type": "best_fields", "fuzziness": "AUTO"}
+        bool_query = {
+            "must": [
+                {
+                    "multi_match": {
+                        "query": query,
+                        "fields": ["title^3", "abstract^2", "keywords"],
+                        **multi_match
+                    }
+                }
+            ]
+        }
+        filter_clauses = self._filter_clauses(filters)
+        if filter_clauses:
+            bool_query["filter"] = filter_clauses
+        return {"bool": bool_query}
     
     def keyword_search(self, query: str, filters: Optional[Dict[str, Any]] = None, 
-                      size: int = 20) -> List[Dict[str, Any]]:
-        """Perform keyword-based search using Elasticsearch BM25"""
+                      size: int = 20, include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """Perform keyword-based search using Elasticsearch BM25
+
+        Hits carry only LIST_SOURCE_FIELDS unless include_embeddings is set, in which case they
+        also carry the stored `embedding` and references (EMBEDDING_SOURCE_FIELDS).
+        """
         search_query = {
-            "query": {
-                "bool": {
-                    "must": [
-                        {
-                            "multi_match": {
-                                "query": query,
-                                "fields": ["title^3", "abstract^2", "keywords"],
-                                "type": "best_fields",
-                                "fuzziness": "AUTO"
-                            }
-                        }
-                    ]
-                }
-            },
-            "size": size
+            "query": self._bm25_query(query, filters),
+            "size": size,
+            # The hit count is never read, so don't make ES count every match
+            "track_total_hits": False
         }
-        
-        # Add filters if provided
-        if filters:
-            for field, value in filters.items():
-                if isinstance(value, list):
-                    search_query["query"]["bool"]["filter"] = [
-                        {"terms": {field: value}}
-                    ]
-                else:
-                    search_query["query"]["bool"]["filter"] = [
-                        {"term": {field: value}}
-                    ]
+        search_query["_source"] = self._source_fields(include_embeddings)
         
         response = self.es.search(
             index=settings.ELASTICSEARCH_INDEX_PAPERS,
-            body=search_query
+            body=search_query,
+            preference="_local"  # prefer local shard copies, which keeps their caches warm
         )
         
         return [hit["_source"] for hit in response["hits"]["hits"]]
@@ -78,10 +158,10 @@ class SearchService:
         # Get query embedding
         query_vector = self.get_embedding(query)
         
-        # Search in FAISS index
-        distances, indices = self.index.search(np.array([query_vector]), size)
+        # Search in FAISS index (already float32 and unit length; reshape is a view, not a copy)
+        distances, indices = self.index.search(query_vector.reshape(1, -1), size)
         
-        # Get paper IDs from indices
+        # Get paper IDs from indices (-1 pads missing results)
         paper_ids = [int(idx) for idx in indices[0] if idx >= 0]
         
         # Get papers from database
@@ -90,54 +170,126 @@ class SearchService:
         
         return papers
     
+    @staticmethod
+    def _rrf_unsupported(error: ApiError) -> bool:
+        """Whether the cluster rejected the RRF retriever itself, as opposed to a transient failure
+
+        Pre-8.14 clusters answer 400 with a parse error on `retriever`; clusters without the license
+        answer 403 naming RRF. Timeouts, 429s and 5xx responses say nothing about support.
+        """
+        message = str(error).lower()
+        if error.status_code == 400:
+            return "retriever" in message
+        if error.status_code == 403:
+            return "rrf" in message or "reciprocal rank fusion" in message
+        return False
+
     def hybrid_search(self, query: str, filters: Optional[Dict[str, Any]] = None, 
-                     size: int = 20, alpha: float = 0.5) -> List[Dict[str, Any]]:
-        """Perform hybrid search combining BM25 and vector search results"""
+                     size: int = 20, alpha: float = 0.5, include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """Perform hybrid search combining BM25 and vector search results
+
+        With equal weighting (alpha=0.5) the fusion runs inside Elasticsearch as an RRF retriever over
+        BM25 and kNN on the stored `embedding` field; otherwise, or when the cluster doesn't support
+        retrievers, both result lists are fetched and fused here.
+        """
+        if alpha == 0.5 and self._server_rrf:
+            try:
+                return self._rrf_search(query, filters, size=size, include_embeddings=include_embeddings)
+            except ApiError as e:
+                if self._rrf_unsupported(e):
+                    logger.warning("Server-side RRF unsupported, fusing in Python from now on: %s", e)
+                    self._server_rrf = False
+                else:
+                    logger.warning("Server-side RRF search failed, fusing this request in Python: %s", e)
+
         # Get keyword search results
-        keyword_results = self.keyword_search(query, filters, size=size)
+        keyword_results = self.keyword_search(query, filters, size=size, include_embeddings=include_embeddings)
         
         # Get vector search results
         vector_results = self.vector_search(query, size=size)
         
         # Combine results with a simple rank fusion
         # In a real implementation, you would use a more sophisticated approach
-        combined_results = {}
-        
-        # Add keyword results with weight (1-alpha)
-        for i, result in enumerate(keyword_results):
+        # One slot per distinct paper id (first occurrence wins, keyword hits first)
+        paper_by_id: Dict[Any, Dict[str, Any]] = {}
+        for result in keyword_results + vector_results:
             paper_id = result.get("id")
             if paper_id:
-                combined_results[paper_id] = {
-                    "paper": result,
-                    "score": (1 - alpha) * (1.0 / (i + 1))  # Reciprocal rank
-                }
+                paper_by_id.setdefault(paper_id, result)
+        if not paper_by_id:
+            return []
+        slot = {paper_id: i for i, paper_id in enumerate(paper_by_id)}
+        ids = list(paper_by_id)
+        scores = np.zeros(len(ids))
         
-        # Add vector results with weight alpha
-        for i, result in enumerate(vector_results):
-            paper_id = result.get("id")
-            if paper_id:
-                if paper_id in combined_results:
-                    combined_results[paper_id]["score"] += alpha * (1.0 / (i + 1))
-                else:
-                    combined_results[paper_id] = {
-                        "paper": result,
-                        "score": alpha * (1.0 / (i + 1))
-                    }
+        # Reciprocal-rank scores, keyword results weighted (1-alpha) and vector results alpha
+        for weight, results in ((1 - alpha, keyword_results), (alpha, vector_results)):
+            ranked = [(slot[r["id"]], i) for i, r in enumerate(results) if r.get("id")]
+            if ranked:
+                rows, ranks = np.array(ranked).T
+                np.add.at(scores, rows, weight / (ranks + 1.0))
         
-        # Sort by score and return papers
-        sorted_results = sorted(
-            combined_results.values(), 
-            key=lambda x: x["score"], 
-            reverse=True
+        # Sort by score (stable, so ties keep first-seen order) and return papers
+        order = np.argsort(-scores, kind="stable")[:size]
+        return [paper_by_id[ids[i]] for i in order]
+
+    def _rrf_search(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                    size: int = 20, include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """One ES request fusing BM25 and kNN hits with reciprocal rank fusion (ES 8.14+ retrievers)"""
+        knn = {
+            "field": "embedding",
+            "query_vector": self.get_embedding(query).tolist(),
+            "k": size,
+            "num_candidates": size * self.KNN_CANDIDATES_FACTOR
+        }
+        filter_clauses = self._filter_clauses(filters)
+        if filter_clauses:
+            knn["filter"] = filter_clauses
+        search_query = {
+            "retriever": {
+                "rrf": {
+                    "retrievers": [
+                        {"standard": {"query": self._bm25_query(query, filters)}},
+                        {"knn": knn}
+                    ],
+                    "rank_window_size": size,
+                    "rank_constant": self.RRF_RANK_CONSTANT
+                }
+            },
+            "size": size
+        }
+        search_query["_source"] = self._source_fields(include_embeddings)
+
+        response = self.es.search(
+            index=settings.ELASTICSEARCH_INDEX_PAPERS,
+            body=search_query,
+            preference="_local"
         )
-        
-        return [item["paper"] for item in sorted_results[:size]]
+        return [hit["_source"] for hit in response["hits"]["hits"]]
     
     def rerank_results(self, query: str, results: List[Dict[str, Any]], 
                       size: int = 10) -> List[Dict[str, Any]]:
         """Rerank search results using a more sophisticated model"""
         # This is a placeholder for a reranking model
         # In a real implementation, you would use a model like BERT or T5
+
+        # When the hits carry their stored embeddings, order them by cosine similarity to the query
+        vectors = [r.get("embedding") for r in results]
+        if results and all(v is not None and len(v) == self.dimension for v in vectors):
+            scores = cosine_similarity_matrix(self.get_embedding(query)[None, :], np.asarray(vectors))[0]
+            order = np.argsort(-scores, kind="stable")[:size]
+            return [results[i] for i in order]
         
-        # For now, just return the top results
-        return results[:size]
\ No newline at end of file
+        # Otherwise just return the top results
+        return results[:size]
+
+
+# Lazy singleton so the ES client, embedding model and FAISS index are built once, on first use
+_search_service_instance: Optional[SearchService] = None
+
+def get_search_service() -> SearchService:
+    """Return a singleton SearchService instance (lazy-initialized)."""
+    global _search_service_instance
+    if _search_service_instance is None:
+        _search_service_instance = SearchService()
+    return _search_service_instance
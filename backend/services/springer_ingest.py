@@ -1,33 +1,112 @@
 import os
 import math
+import asyncio
+from itertools import islice
 import httpx
+import orjson
+from elasticsearch.helpers import bulk
 from app.core.config import settings
+from app.services.ai_features import auto_tag
 
 # Reuse Elasticsearch client and index name from arxiv_ingest for consistency
-from app.services.arxiv_ingest import es, INDEX_NAME
+from app.services.arxiv_ingest import es, INDEX_NAME, INDEX_MAPPINGS, BULK_CHUNK_SIZE, add_embeddings, suggest_field
 
 SPRINGER_API_URL = "https://api.springernature.com/metadata/json"
 
-def fetch_springer_papers(query="machine learning", max_results=100, page_size=20, api_key=None):
+# Springer uses various keys for the same field; each tuple is tried in order
+AUTHOR_KEYS = ('creators', 'creator', 'authors')
+AUTHOR_NAME_KEYS = ('creator', 'name', 'fullName')
+DATE_KEYS = ('publicationDate', 'onlineDate', 'publication_date', 'date')
+DOI_KEYS = ('doi', 'identifier', 'ids')
+ABSTRACT_KEYS = ('abstract', 'description')
+ID_KEYS = ('isbn', 'printIdentifier')
+
+
+def _first(rec, keys, default=None):
+    """Value of the first key in `keys` with a truthy value in rec, else default."""
+    for key in keys:
+        value = rec.get(key)
+        if value:
+            return value
+    return default
+
+
+def _parse_record(rec, fallback_id):
+    """Map one Springer metadata record to the project's index schema."""
+    # Map common fields. Springer uses various keys; be defensive.
+    title = rec.get('title') or (rec.get('titles') and rec['titles'][0]) or ''
+    # authors: often in 'creators' or 'creator' or 'authors'
+    authors_raw = _first(rec, AUTHOR_KEYS, [])
+    authors = []
+    if isinstance(authors_raw, list):
+        for a in authors_raw:
+            if isinstance(a, dict):
+                name = _first(a, AUTHOR_NAME_KEYS) or a.get('given') and a.get('family') and f"{a.get('given')} {a.get('family')}" or None
+            else:
+                name = str(a)
+            if name:
+                authors.append({'name': name})
+    elif isinstance(authors_raw, str):
+        authors = [{'name': x.strip()} for x in authors_raw.split(',') if x.strip()]
+
+    # published date
+    pub = _first(rec, DATE_KEYS)
+    pub_str = None
+    if isinstance(pub, str):
+        pub_str = pub
+
+    # url(s)
+    url = None
+    # Springer may return 'url' as list of dicts with 'value'
+    if 'url' in rec:
+        u = rec['url']
+        if isinstance(u, list) and u:
+            first = u[0]
+            if isinstance(first, dict):
+                url = first.get('value') or first.get('url')
+            else:
+                url = str(first)
+        elif isinstance(u, str):
+            url = u
+
+    # doi
+    doi = _first(rec, DOI_KEYS)
+
+    abstract = _first(rec, ABSTRACT_KEYS, '')
+    # Keep publisher keywords; tag records without any at ingest time
+    keywords = rec.get('keywords') or auto_tag(title, abstract)
+    return {
+        'id': doi or _first(rec, ID_KEYS, fallback_id),
+        'title': title,
+        'abstract': abstract,
+        'authors': authors,
+        'published': pub_str,
+        'url': url,
+        'doi': doi,
+        'keywords': keywords,
+        'suggest': suggest_field(title, keywords)
+    }
+
+
+async def _fetch_springer_pages(query, max_results, page_size, api_key, concurrency):
     """
-    Fetch metadata from Springer Nature Metadata API.
+    Fetch raw record pages from Springer Nature Metadata API, requesting pages concurrently.
 
     Notes:
     - Requires an API key (pass explicitly or set SPRINGER_API_KEY env var).
-    - This function pages through results using 'p' (page size) and 's' (start index, 1-based).
-    - Returns a list of paper dicts mapped to the project's index schema.
+    - Pages are addressed by 'p' (page size) and 's' (start index, 1-based), so every page
+      start is known up front; at most `concurrency` page requests are in flight at once.
+    - Returns (page_size, [(start, records or None), ...]) in page order.
     """
     api_key = api_key or os.getenv('SPRINGER_API_KEY')
     if not api_key:
         raise RuntimeError('SPRINGER_API_KEY is not set in environment')
 
-    client = httpx.Client(timeout=30.0)
-    papers = []
-    fetched = 0
-    start = 1
     page_size = min(page_size, 100)  # API cap
+    starts = list(range(1, max_results + 1, page_size))
+    sem = asyncio.Semaphore(concurrency)
 
-    while fetched < max_results:
+    async def _page(client, start):
         params = {
             'q': query,
             'api_key': api_key,
@@ -35,99 +114,79 @@ def fetch_springer_papers(query="machine learning", max_results=100, page_size=2
             's': start
         }
         try:
-            r = client.get(SPRINGER_API_URL, params=params)
+            async with sem:
+                r = await client.get(SPRINGER_API_URL, params=params)
             r.raise_for_status()
-            data = r.json()
+            data = orjson.loads(r.content)
         except Exception as e:
             print('Springer fetch error:', e)
-            break
+            return None
+        return data.get('records') or data.get('result', {}).get('records') or []
+
+    # Keep-alive pooled client shared by all page requests
+    async with httpx.AsyncClient(http2=True, timeout=30.0,
+                                 limits=httpx.Limits(max_connections=concurrency,
+                                                     max_keepalive_connections=concurrency)) as client:
+        pages = await asyncio.gather(*[_page(client, s) for s in starts])
+
+    return page_size, list(zip(starts, pages))
 
-        records = data.get('records') or data.get('result', {}).get('records') or []
-        if not records:
-            break
 
+def _iter_parsed(page_size, pages, max_results):
+    """Yield parsed papers from fetched pages in order, one record at a time."""
+    count = 0
+    for start, records in pages:
+        # A failed or empty page means the results ended there; later pages are ignored
+        if not records:
+            return
         for rec in records:
-            if fetched >= max_results:
-                break
-
-            # Map common fields. Springer uses various keys; be defensive.
-            title = rec.get('title') or (rec.get('titles') and rec['titles'][0]) or ''
-            # authors: often in 'creators' or 'creator' or 'authors'
-            authors_raw = rec.get('creators') or rec.get('creator') or rec.get('creators') or rec.get('authors') or []
-            authors = []
-            if isinstance(authors_raw, list):
-                for a in authors_raw:
-                    if isinstance(a, dict):
-                        name = a.get('creator') or a.get('name') or a.get('fullName') or a.get('given') and a.get('family') and f"{a.get('given')} {a.get('family')}" or None
-                    else:
-                        name = str(a)
-                    if name:
-                        authors.append({'name': name})
-            elif isinstance(authors_raw, str):
-                authors = [{'name': x.strip()} for x in authors_raw.split(',') if x.strip()]
-
-            # published date
-            pub = rec.get('publicationDate') or rec.get('onlineDate') or rec.get('publication_date') or rec.get('date') or None
-            pub_str = None
-            if isinstance(pub, str):
-                pub_str = pub
-
-            # url(s)
-            url = None
-            # Springer may return 'url' as list of dicts with 'value'
-            if 'url' in rec:
-                u = rec['url']
-                if isinstance(u, list) and u:
-                    first = u[0]
-                    if isinstance(first, dict):
-                        url = first.get('value') or first.get('url')
-                    else:
-                        url = str(first)
-                elif isinstance(u, str):
-                    url = u
-
-            # doi
-            doi = rec.get('doi') or rec.get('identifier') or rec.get('ids')
-
-            paper = {
-                'id': doi or rec.get('isbn') or rec.get('printIdentifier') or f"springer-{rec.get('id', start)}-{fetched}",
-                'title': title,
-                'abstract': rec.get('abstract') or rec.get('description') or '',
-                'authors': authors,
-                'published': pub_str,
-                'url': url,
-                'doi': doi,
-                'keywords': rec.get('keywords') or []
-            }
-
-            papers.append(paper)
-            fetched += 1
-
-        # Prepare next page
-        start += page_size
-        # if number of returned records less than page_size, we're done
+            if count >= max_results:
+                return
+            yield _parse_record(rec, f"springer-{rec.get('id', start)}-{count}")
+            count += 1
+        # A short page is the last one
         if len(records) < page_size:
-            break
+            return
+
 
-    client.close()
-    return papers
+async def fetch_springer_papers_async(query="machine learning", max_results=100, page_size=20, api_key=None,
+                                      concurrency=4):
+    """Fetch Springer metadata as a list of paper dicts mapped to the project's index schema."""
+    page_size, pages = await _fetch_springer_pages(query, max_results, page_size, api_key, concurrency)
+    return list(_iter_parsed(page_size, pages, max_results))
+
+
+def iter_springer_papers(query="machine learning", max_results=100, page_size=20, api_key=None, concurrency=4):
+    """Fetch the result pages, then yield papers one by one as they are parsed (for streaming into bulk)."""
+    page_size, pages = asyncio.run(_fetch_springer_pages(query, max_results, page_size, api_key, concurrency))
+    yield from _iter_parsed(page_size, pages, max_results)
+
+
+def fetch_springer_papers(query="machine learning", max_results=100, page_size=20, api_key=None):
+    """Sync counterpart of fetch_springer_papers_async."""
+    return list(iter_springer_papers(query=query, max_results=max_results, page_size=page_size, api_key=api_key))
 
 
 def index_papers_to_elasticsearch(papers):
-    if not papers:
+    """Index an iterable of papers chunk by chunk, so a generator like iter_springer_papers() is
+    parsed, embedded and bulked incrementally rather than materialized first."""
+    papers = iter(papers)
+    chunk = list(islice(papers, BULK_CHUNK_SIZE))
+    if not chunk:
         print('No Springer papers to index.')
         return
     # Ensure index exists
     if not es.indices.exists(index=INDEX_NAME):
-        es.indices.create(index=INDEX_NAME)
+        es.indices.create(index=INDEX_NAME, mappings=INDEX_MAPPINGS)
     count = 0
-    for paper in papers:
-        try:
-            es.index(index=INDEX_NAME, id=paper['id'], body=paper)
-            print(f"Indexed Springer paper: {paper.get('title')}")
-            count += 1
-        except Exception as e:
-            print('Failed to index paper', paper.get('id'), e)
+    while chunk:
+        add_embeddings(chunk)
+        actions = ({'_index': INDEX_NAME, '_id': paper['id'], '_source': paper} for paper in chunk)
+        indexed, errors = bulk(es, actions, chunk_size=BULK_CHUNK_SIZE, request_timeout=60, raise_on_error=False)
+        for err in errors:
+            print('Failed to index paper', err)
+        count += indexed
+        chunk = list(islice(papers, BULK_CHUNK_SIZE))
     print(f"Indexed {count} Springer papers to Elasticsearch.")
 
 
@@ -137,5 +196,5 @@ if __name__ == '__main__':
     if not key:
         print('Set SPRINGER_API_KEY in environment to ingest Springer metadata.')
     else:
-        papers = fetch_springer_papers(query='machine learning', max_results=200, page_size=50, api_key=key)
+        papers = iter_springer_papers(query='machine learning', max_results=200, page_size=50, api_key=key)
         index_papers_to_elasticsearch(papers)
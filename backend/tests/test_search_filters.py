@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("elasticsearch")
+pytest.importorskip("sentence_transformers")
+
+from app.services.search import SearchService
+
+
+def _bm25_query(query, filters):
+    # _bm25_query only reads class constants, so no ES client or model is needed
+    return SearchService._bm25_query(object.__new__(SearchService), query, filters)
+
+
+def test_all_filters_map_to_indexed_fields():
+    filters = {
+        "authors": ["Ada Lovelace", "Alan Turing"],
+        "topics": ["transformers"],
+        "year_from": 2018,
+        "year_to": 2021,
+        "journals": ["Nature"],
+    }
+
+    bool_query = _bm25_query("attention", filters)["bool"]
+
+    assert bool_query["filter"] == [
+        {"terms": {"authors.name.keyword": ["Ada Lovelace", "Alan Turing"]}},
+        {"terms": {"journal.keyword": ["Nature"]}},
+        {"terms": {"keywords.keyword": ["transformers"]}},
+        {"range": {"published": {"gte": "2018||/y", "lte": "2021||/y"}}},
+    ]
+    assert bool_query["must"][0]["multi_match"]["query"] == "attention"
+
+
+def test_open_ended_year_range():
+    bool_query = _bm25_query("attention", {"year_from": 2020})["bool"]
+
+    assert bool_query["filter"] == [{"range": {"published": {"gte": "2020||/y"}}}]
+
+
+def test_unset_filters_add_no_filter_clause():
+    # SearchFilters.dict() passes every field, unset ones as None
+    filters = {"authors": None, "topics": None, "year_from": None, "year_to": None, "journals": None}
+
+    assert "filter" not in _bm25_query("attention", filters)["bool"]
+    assert "filter" not in _bm25_query("attention", None)["bool"]